@@ -0,0 +1,56 @@
+# bench/bench_db_writer.py
+"""
+Sustained insert throughput of the node's log writer.
+
+Compares the old per-row pattern (fresh connection + commit per chunk) with the
+batched write-behind LogWriter in WAL mode, on a throwaway database.
+"""
+import argparse, os, sys, sqlite3, tempfile, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "node")))
+from db_writer import LogWriter, init_db, INSERT_LOG
+
+def make_row(i):
+    now = time.time()
+    text = f"chunk {i} the quick brown fox jumps over the lazy dog"
+    return (f"call{i % 50}", now - 1.0, now - 0.2, now, 160044, len(text), text, 0.0, 1, None)
+
+def bench_per_row(db_path, n):
+    start = time.perf_counter()
+    for i in range(n):
+        conn = sqlite3.connect(db_path)
+        conn.execute(INSERT_LOG, make_row(i))
+        conn.commit()
+        conn.close()
+    return time.perf_counter() - start
+
+def bench_writer(db_path, n, batch_size, flush_interval):
+    writer = LogWriter(db_path, batch_size=batch_size, flush_interval=flush_interval).start()
+    start = time.perf_counter()
+    for i in range(n):
+        writer.write(make_row(i))
+    enqueue_secs = time.perf_counter() - start
+    writer.close(timeout=None)
+    return time.perf_counter() - start, enqueue_secs, writer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark XAIONET log insert throughput.")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows for the batched writer.")
+    parser.add_argument("--baseline-rows", type=int, default=500, help="Rows for the per-row baseline (slow).")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_db = os.path.join(tmp, "baseline.db")
+        init_db(base_db)
+        sqlite3.connect(base_db).execute("PRAGMA journal_mode=DELETE").fetchone()  # old rollback-journal mode
+        secs = bench_per_row(base_db, args.baseline_rows)
+        print(f"per-row connect+commit: {args.baseline_rows} rows in {secs:.2f}s "
+              f"-> {args.baseline_rows / secs:,.0f} rows/s")
+
+        wal_db = os.path.join(tmp, "writer.db")
+        init_db(wal_db)
+        secs, enqueue_secs, writer = bench_writer(wal_db, args.rows, args.batch_size, args.flush_interval)
+        print(f"LogWriter (WAL, batch {args.batch_size}): {writer.rows_written} rows in "
+              f"{writer.batches_written} batches, {secs:.2f}s -> {writer.rows_written / secs:,.0f} rows/s "
+              f"(event-loop cost {1e6 * enqueue_secs / args.rows:.1f} us/row)")
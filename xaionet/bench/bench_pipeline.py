@@ -0,0 +1,320 @@
+# bench/bench_pipeline.py
+"""
+End-to-end load test of node_ws.py.
+
+Replays a corpus of WAV files as N concurrent simulated senders (binary
+protocol, one chunk every --interval seconds each) and attaches M simulated
+receivers. Reports throughput, capture->forward and capture->receive latency
+percentiles, node queue depth and drops, and writes the run as JSON so results
+can be compared over time.
+
+By default a node is started for the run on spare ports with a throwaway
+database and the stub ASR engine (no model download); pass --engine whisper or
+faster-whisper to measure the real model, or --node to target a node that is
+already running. With --nodes N, N nodes are started behind node/router.py
+so scaling across nodes can be measured.
+
+    python bench_pipeline.py --corpus ../samples --senders 8 --receivers 2 --duration 60
+"""
+import argparse, asyncio, glob, json, os, platform, subprocess, sys, tempfile, time
+import numpy as np
+import soundfile as sf
+import websockets
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.audio_utils import resample_linear
+from utils.wire_protocol import pack_chunk, ENC_PCM16
+
+NODE_SCRIPT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "node", "node_ws.py"))
+ROUTER_SCRIPT = os.path.join(os.path.dirname(NODE_SCRIPT), "router.py")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SR = 16000
+BENCH_PORT = 8865
+STARTUP_TIMEOUT_SECS = 300  # real models can take minutes to load on first run
+STATS_POLL_SECS = 1.0
+
+# ================== Corpus ==================
+def load_corpus(paths, chunk_secs):
+    """WAV files -> list of int16 chunks of chunk_secs at 16 kHz."""
+    files = []
+    for p in paths:
+        files.extend(sorted(glob.glob(os.path.join(p, "*.wav"))) if os.path.isdir(p) else [p])
+    chunk_len = int(chunk_secs * SR)
+    chunks = []
+    for path in files:
+        data, sr = sf.read(path, dtype="float32", always_2d=True)
+        pcm = (np.clip(resample_linear(data.mean(axis=1), sr, SR), -1.0, 1.0) * 32767).astype(np.int16)
+        for start in range(0, len(pcm) - chunk_len // 2, chunk_len):
+            chunks.append(pcm[start:start + chunk_len])
+    return chunks
+
+def synthetic_corpus(chunk_secs, n=8):
+    """Tone bursts with gaps, used when no corpus is given (fine for the stub engine)."""
+    t = np.arange(int(chunk_secs * SR)) / SR
+    chunks = []
+    for i in range(n):
+        tone = 0.3 * np.sin(2 * np.pi * (180 + 40 * i) * t) * (np.sin(2 * np.pi * 0.7 * t) > -0.5)
+        chunks.append((tone * 32767).astype(np.int16))
+    return chunks
+
+# ================== Metrics ==================
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values) * 1000.0
+    return {"count": len(values), "mean_ms": float(arr.mean()), "p50_ms": float(np.percentile(arr, 50)),
+            "p95_ms": float(np.percentile(arr, 95)), "p99_ms": float(np.percentile(arr, 99)),
+            "max_ms": float(arr.max())}
+
+class Results:
+
+    def __init__(self):
+        self.sent = 0
+        self.sent_bytes = 0
+        self.acked = 0
+        self.rejected = 0
+        self.send_errors = 0
+        self.forward_latency = {}   # (session_id, capture_ts) -> forward_ts - capture_ts
+        self.receive_latency = []   # one entry per receiver per payload
+        self.received = 0
+        self.stats_samples = []     # node stats snapshots
+
+# ================== Simulated Clients ==================
+async def connect(uri, timeout):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return await websockets.connect(uri, max_size=None)
+        except (OSError, websockets.exceptions.WebSocketException):
+            if time.time() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+async def sender(uri, idx, n_senders, corpus, interval, stop_at, results):
+    session_id = f"bench-{idx}"
+    ws = await connect(uri, 10)
+    await ws.send(json.dumps({"type": "register", "role": "sender", "session_id": session_id,
+                              "stream_id": f"bench-{os.getpid()}-{idx}"}))
+
+    async def read_replies():
+        async for msg in ws:
+            obj = json.loads(msg)
+            if obj.get("type") == "ack":
+                results.acked += 1
+            elif obj.get("type") == "overload":
+                results.rejected += 1
+
+    reader = asyncio.create_task(read_replies())
+    seq = 0
+    # Stagger senders so they do not all fire in the same millisecond
+    next_at = time.time() + interval * idx / n_senders
+    while time.time() < stop_at:
+        await asyncio.sleep(max(next_at - time.time(), 0))
+        chunk = corpus[(idx + seq) % len(corpus)]
+        frame = pack_chunk(session_id, seq, time.time(), chunk.astype("<i2").tobytes(), SR, ENC_PCM16)
+        try:
+            await ws.send(frame)
+        except websockets.exceptions.ConnectionClosed:
+            results.send_errors += 1
+            break
+        results.sent += 1
+        results.sent_bytes += len(frame)
+        seq += 1
+        next_at += interval
+    return ws, reader
+
+async def receiver(uri, results, collect_forward):
+    ws = await connect(uri, 10)
+    await ws.send(json.dumps({"type": "register", "role": "receiver", "session_id": "bench-receiver"}))
+    try:
+        async for msg in ws:
+            now = time.time()
+            obj = json.loads(msg)
+            if obj.get("type") != "semantic":
+                continue
+            p = obj["payload"]
+            capture_ts = p.get("capture_ts")
+            if capture_ts is None:
+                continue
+            results.received += 1
+            results.receive_latency.append(now - capture_ts)
+            if collect_forward:
+                results.forward_latency[(p["session_id"], capture_ts)] = p["forward_ts"] - capture_ts
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+async def monitor(uri, results):
+    ws = await connect(uri, 10)
+    await ws.send(json.dumps({"type": "register", "role": "monitor", "session_id": "bench-monitor"}))
+    try:
+        while True:
+            await ws.send(json.dumps({"type": "stats"}))
+            obj = json.loads(await ws.recv())
+            if obj.get("type") == "stats":
+                results.stats_samples.append(obj)
+            await asyncio.sleep(STATS_POLL_SECS)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+# ================== Run ==================
+async def wait_for_nodes(uri, n_nodes, timeout):
+    """Behind a router, waits until every node has joined the ring."""
+    ws = await connect(uri, timeout)
+    await ws.send(json.dumps({"type": "register", "role": "monitor", "session_id": "bench-startup"}))
+    deadline = time.time() + timeout
+    while True:
+        await ws.send(json.dumps({"type": "stats"}))
+        stats = json.loads(await ws.recv())
+        up = sum(n["up"] for n in stats.get("nodes", {}).values()) if "nodes" in stats else 1
+        if up >= n_nodes or time.time() > deadline:
+            break
+        await asyncio.sleep(0.5)
+    await ws.close()
+
+async def run(uri, corpus, n_senders, n_receivers, interval, duration, drain_secs, startup_timeout, n_nodes=1):
+    results = Results()
+    # Wait for the node(s) (model load) before the clock starts
+    await wait_for_nodes(uri, n_nodes, startup_timeout)
+    tasks = [asyncio.create_task(receiver(uri, results, i == 0)) for i in range(max(n_receivers, 1))]
+    tasks.append(asyncio.create_task(monitor(uri, results)))
+    await asyncio.sleep(0.5)
+
+    started = time.time()
+    senders = await asyncio.gather(*(sender(uri, i, n_senders, corpus, interval, started + duration, results)
+                                     for i in range(n_senders)))
+    send_secs = time.time() - started
+    # Let queued chunks finish before closing
+    deadline = time.time() + drain_secs
+    while time.time() < deadline and results.acked < results.sent:  # rejected chunks are acked too
+        await asyncio.sleep(0.2)
+    elapsed = time.time() - started
+    await asyncio.sleep(STATS_POLL_SECS)
+
+    for ws, reader in senders:
+        reader.cancel()
+        await ws.close()
+    for t in tasks:
+        t.cancel()
+    return results, send_secs, elapsed
+
+def summarize(results, args, send_secs, elapsed, n_receivers):
+    stats = results.stats_samples
+    depths = [s["queues"].get("queue_depth_total", 0) for s in stats]
+    last = stats[-1] if stats else {"queues": {}, "receivers": {}, "stages": {}}
+    forwarded = len(results.forward_latency)
+    return {
+        "ts": time.time(),
+        "host": platform.node(),
+        "config": {"senders": args.senders, "receivers": n_receivers, "interval_secs": args.interval,
+                   "chunk_secs": args.chunk_secs, "duration_secs": args.duration, "engine": args.engine,
+                   "model": args.model, "workers": args.workers, "nodes": args.nodes,
+                   "node": args.node or "spawned",
+                   "node_args": args.node_args},
+        "sent": results.sent,
+        "sent_mb": results.sent_bytes / 1e6,
+        "acked": results.acked,
+        "forwarded": forwarded,
+        "received": results.received,
+        "send_secs": send_secs,
+        "elapsed_secs": elapsed,
+        "offered_chunks_per_sec": results.sent / send_secs if send_secs else 0.0,
+        "throughput_chunks_per_sec": forwarded / elapsed if elapsed else 0.0,
+        "latency_capture_to_forward": percentiles(list(results.forward_latency.values())),
+        "latency_capture_to_receive": percentiles(results.receive_latency),
+        "queue_depth": {"mean": float(np.mean(depths)) if depths else 0.0, "max": max(depths, default=0)},
+        "drops": {
+            "node_queue_dropped": last["queues"].get("dropped", 0),
+            "node_queue_rejected": last["queues"].get("rejected", 0),
+            "vad_dropped": last["stages"].get("vad_dropped", 0),
+            "receiver_dropped": last["receivers"].get("dropped", 0),
+            "sender_rejected": results.rejected,
+            "send_errors": results.send_errors,
+            "no_result": results.sent - forwarded
+        },
+        "node_stages": last["stages"],
+        "nodes": last.get("nodes")
+    }
+
+def spawn(cmd, log_path):
+    log = open(log_path, "w")
+    print("Starting:", " ".join(cmd))
+    return subprocess.Popen(cmd, cwd=os.path.dirname(NODE_SCRIPT), stdout=log, stderr=subprocess.STDOUT), log
+
+def spawn_cluster(args, tmp):
+    """One node on --port, or --nodes nodes behind a router on --port. Returns [(proc, log)]."""
+    db_path = os.path.join(tmp, "bench.db")  # shared; WAL serialises the writers
+    ports = [args.port] if args.nodes == 1 else [args.port + 10 * (i + 1) for i in range(args.nodes)]
+    procs = []
+    for i, port in enumerate(ports):
+        cmd = [sys.executable, NODE_SCRIPT, "--port", str(port), "--override-port", str(port + 1),
+               "--metrics-port", str(port + 2), "--db", db_path, "--engine", args.engine,
+               "--model", args.model, "--workers", str(args.workers), "--stats-interval", "10"] + args.node_args
+        procs.append(spawn(cmd, os.path.join(tmp, f"node{i}.log")))
+    if args.nodes > 1:
+        cmd = [sys.executable, ROUTER_SCRIPT, "--port", str(args.port), "--stats-interval", "10",
+               "--nodes"] + [f"ws://127.0.0.1:{port}" for port in ports]
+        procs.append(spawn(cmd, os.path.join(tmp, "router.log")))
+    return procs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test an XAIONET node end to end.")
+    parser.add_argument("--corpus", nargs="*", default=[], help="WAV files or directories (default: synthetic tones).")
+    parser.add_argument("--senders", type=int, default=4, help="Concurrent simulated senders (N).")
+    parser.add_argument("--receivers", type=int, default=1, help="Simulated receivers (M).")
+    parser.add_argument("--chunk-secs", type=float, default=5.0, help="Audio per chunk.")
+    parser.add_argument("--interval", type=float, default=None, help="Seconds between chunks per sender (default: chunk length, i.e. real time).")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of sending.")
+    parser.add_argument("--drain-secs", type=float, default=30.0, help="Max wait for outstanding results after sending stops.")
+    parser.add_argument("--node", default=None, help="ws:// URI of a running node (default: start one).")
+    parser.add_argument("--engine", default="stub", help="ASR engine for a spawned node.")
+    parser.add_argument("--model", default="small", help="Model for a spawned node.")
+    parser.add_argument("--workers", type=int, default=2, help="Workers per spawned node.")
+    parser.add_argument("--nodes", type=int, default=1, help="Spawned nodes; more than 1 adds a router in front.")
+    parser.add_argument("--port", type=int, default=BENCH_PORT, help="WebSocket port for the spawned node or router.")
+    parser.add_argument("--node-args", nargs=argparse.REMAINDER, default=[], help="Extra node_ws.py arguments (must come last).")
+    parser.add_argument("--startup-timeout", type=float, default=STARTUP_TIMEOUT_SECS)
+    parser.add_argument("--out", default=None, help="JSON results path (default: results/pipeline-<time>.json).")
+    args = parser.parse_args()
+    args.interval = args.interval or args.chunk_secs
+
+    corpus = load_corpus(args.corpus, args.chunk_secs) if args.corpus else synthetic_corpus(args.chunk_secs)
+    if not corpus:
+        sys.exit("Corpus contains no audio.")
+    print(f"Corpus: {len(corpus)} chunks of {args.chunk_secs}s")
+
+    tmp = tempfile.TemporaryDirectory()
+    procs = []
+    uri = args.node
+    if uri is None:
+        procs = spawn_cluster(args, tmp.name)
+        uri = f"ws://127.0.0.1:{args.port}"
+    try:
+        results, send_secs, elapsed = asyncio.run(run(uri, corpus, args.senders, args.receivers, args.interval,
+                                                      args.duration, args.drain_secs, args.startup_timeout,
+                                                      args.nodes if procs else 1))
+    finally:
+        for proc, log in procs:
+            proc.terminate()
+            proc.wait(timeout=30)
+            log.close()
+            if proc.returncode not in (0, -15):
+                with open(log.name) as f:
+                    print(f.read()[-4000:])
+        tmp.cleanup()
+
+    summary = summarize(results, args, send_secs, elapsed, args.receivers)
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("pipeline-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    fwd, rcv = summary["latency_capture_to_forward"], summary["latency_capture_to_receive"]
+    print(f"Sent {summary['sent']} chunks ({summary['offered_chunks_per_sec']:.2f}/s offered), "
+          f"forwarded {summary['forwarded']} ({summary['throughput_chunks_per_sec']:.2f}/s), "
+          f"received {summary['received']} across {args.receivers} receivers")
+    for name, lat in (("capture->forward", fwd), ("capture->receive", rcv)):
+        if lat["count"]:
+            print(f"{name}: p50 {lat['p50_ms']:.0f}ms  p95 {lat['p95_ms']:.0f}ms  p99 {lat['p99_ms']:.0f}ms  "
+                  f"max {lat['max_ms']:.0f}ms")
+    print(f"Queue depth mean {summary['queue_depth']['mean']:.1f}, max {summary['queue_depth']['max']}; "
+          f"drops {summary['drops']}")
+    print("Results written to", out)
@@ -0,0 +1,188 @@
+# dashboard/aggregator.py
+"""
+Rolling aggregates over the updates the node pushes to the dashboard.
+
+/update only folds each item into per-second slots and running totals (a few
+counter increments). Browsers never see raw items: a background task emits a
+compact frame at FRAME_HZ with the windowed rates, priority/sentiment
+histograms, latency percentiles, the busiest sessions, the high-priority
+items that arrived since the previous frame and a capped sample of the
+latest items. A newly connected browser gets snapshot(full=True), which also
+carries the whole high-priority feed.
+
+Node telemetry items ({"type": "telemetry"}, CPU/RSS and bandwidth savings)
+are not aggregated; the latest one per node rides along in every frame.
+"""
+import bisect, threading, time
+from collections import Counter, deque
+
+WINDOW_SECS = 60
+FRAME_HZ = 2.0
+FEED_SIZE = 50             # high-priority items kept for new browsers
+LATEST_PER_FRAME = 10      # newest items sent per frame; the rest are only counted
+TOP_SESSIONS = 25
+HIGH_PRIORITY = 8
+TEXT_CHARS = 280           # feed text is truncated to keep frames small
+TELEMETRY_TTL_SECS = 30    # nodes that stop reporting drop out of the frame
+# Seconds, capture -> forward; percentiles report the bucket's upper bound
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0)
+PERCENTILES = (50, 95, 99)
+
+def priority_band(priority):
+    if priority >= HIGH_PRIORITY:
+        return "high"
+    return "medium" if priority >= 5 else "low"
+
+def _item(payload):
+    text = payload.get("text") or ""
+    return {"session_id": payload.get("session_id"), "text": text[:TEXT_CHARS],
+            "priority": payload.get("priority", 0), "sentiment": payload.get("sentiment"),
+            "polarity": payload.get("polarity"), "capture_ts": payload.get("capture_ts"),
+            "forward_ts": payload.get("forward_ts")}
+
+class _Slot:
+    """Counts for one second (or, as the running total, for the whole window)."""
+
+    def __init__(self, sec=None):
+        self.sec = sec
+        self.chunks = 0
+        self.priority = Counter()
+        self.sentiment = Counter()
+        self.sessions = Counter()
+        self.high = Counter()       # high-priority items per session
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, session_id, priority, sentiment, latency, sign=1):
+        self.chunks += sign
+        self.priority[priority] += sign
+        self.sentiment[sentiment] += sign
+        self.sessions[session_id] += sign
+        if priority >= HIGH_PRIORITY:
+            self.high[session_id] += sign
+        if latency is not None:
+            self.latency[bisect.bisect_left(LATENCY_BUCKETS, latency)] += sign
+
+    def subtract(self, other):
+        self.chunks -= other.chunks
+        for mine, theirs in ((self.priority, other.priority), (self.sentiment, other.sentiment),
+                             (self.sessions, other.sessions), (self.high, other.high)):
+            mine.subtract(theirs)
+            for k in theirs:
+                if mine[k] <= 0:
+                    del mine[k]
+        self.latency = [a - b for a, b in zip(self.latency, other.latency)]
+
+class Aggregator:
+
+    def __init__(self, window_secs=WINDOW_SECS, feed_size=FEED_SIZE):
+        self.window_secs = window_secs
+        self.received = 0
+        self._slots = deque()
+        self._total = _Slot()
+        self._last_seen = {}        # session_id -> (ts, last priority)
+        self._feed = deque(maxlen=feed_size)
+        self._feed_new = []
+        self._latest = deque(maxlen=LATEST_PER_FRAME)
+        self._unsent = 0
+        self._telemetry = {}        # node -> latest telemetry item
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def set_telemetry(self, item):
+        with self._lock:
+            self._telemetry[item.get("node", "node")] = dict(item, received=time.time())
+            self._dirty = True
+
+    def add(self, payload):
+        now = time.time()
+        session_id = payload.get("session_id") or "unknown"
+        priority = int(payload.get("priority") or 0)
+        sentiment = (payload.get("sentiment") or "neutral").lower()
+        capture_ts, forward_ts = payload.get("capture_ts"), payload.get("forward_ts")
+        latency = forward_ts - capture_ts if capture_ts and forward_ts else None
+        item = _item(payload)
+        with self._lock:
+            sec = int(now)
+            if not self._slots or self._slots[-1].sec != sec:
+                self._slots.append(_Slot(sec))
+            for slot in (self._slots[-1], self._total):
+                slot.add(session_id, priority, sentiment, latency)
+            self._last_seen[session_id] = (now, priority)
+            if priority >= HIGH_PRIORITY:
+                self._feed.append(item)
+                self._feed_new.append(item)
+            self._latest.append(item)
+            self._unsent += 1
+            self.received += 1
+            self._dirty = True
+
+    def _expire(self, now):
+        cutoff = int(now) - self.window_secs
+        while self._slots and self._slots[0].sec <= cutoff:
+            self._total.subtract(self._slots.popleft())
+            self._dirty = True
+        for session_id, (ts, _) in list(self._last_seen.items()):
+            if ts <= cutoff:
+                del self._last_seen[session_id]
+        for node, item in list(self._telemetry.items()):
+            if item["received"] < now - TELEMETRY_TTL_SECS:
+                del self._telemetry[node]
+                self._dirty = True
+
+    def _percentiles(self):
+        counts = self._total.latency
+        n = sum(counts)
+        out = {"count": n}
+        for p in PERCENTILES:
+            value, need, seen = None, p / 100.0 * n, 0
+            for bound, c in zip(LATENCY_BUCKETS + (None,), counts):
+                seen += c
+                if n and seen >= need:
+                    value = bound if bound is not None else f">{LATENCY_BUCKETS[-1]}"
+                    break
+            out[f"p{p}"] = value
+        return out
+
+    def _snapshot(self, now):
+        total = self._total
+        bands = Counter()
+        for p, n in total.priority.items():
+            bands[priority_band(p)] += n
+        sessions = [{"session_id": s, "chunks": n, "rate": n / self.window_secs, "high": total.high[s],
+                     "last_seen": self._last_seen.get(s, (None,))[0],
+                     "last_priority": self._last_seen.get(s, (None, None))[1]}
+                    for s, n in total.sessions.most_common(TOP_SESSIONS)]
+        return {"ts": now, "window_secs": self.window_secs, "received": self.received,
+                "chunks": total.chunks, "rate": total.chunks / self.window_secs,
+                "session_count": len(total.sessions), "sessions": sessions,
+                "priority": {str(p): n for p, n in sorted(total.priority.items())},
+                "priority_bands": {b: bands[b] for b in ("low", "medium", "high")},
+                "sentiment": dict(total.sentiment), "latency": self._percentiles(),
+                "telemetry": dict(self._telemetry)}
+
+    def snapshot(self, full=False):
+        """Current windowed state; full=True adds the whole high-priority feed (for new browsers)."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            snap = self._snapshot(now)
+            if full:
+                snap["feed"] = list(self._feed)
+        return snap
+
+    def frame(self):
+        """Snapshot plus the items since the previous frame, or None if nothing changed."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if not self._dirty:
+                return None
+            snap = self._snapshot(now)
+            snap["feed_new"] = self._feed_new[-self._feed.maxlen:]
+            snap["latest"] = list(self._latest)[-self._unsent:] if self._unsent else []
+            snap["skipped"] = max(0, self._unsent - LATEST_PER_FRAME)
+            self._feed_new = []
+            self._latest.clear()
+            self._unsent = 0
+            self._dirty = False
+        return snap
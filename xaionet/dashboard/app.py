@@ -1,6 +1,8 @@
 from flask import Flask, request, render_template, jsonify
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, emit
 import requests
+import threading
+from aggregator import Aggregator, FRAME_HZ
 
 # Correction 1: Use __name__
 app = Flask(__name__)
@@ -8,6 +10,20 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'secret!'
 socketio = SocketIO(app, cors_allowed_origins="*")
 NODE_OVERRIDE_URL = "http://localhost:8000/override"
+NODE_SEARCH_URL = "http://localhost:8000/search"
+
+# Browsers get aggregated frames at FRAME_HZ instead of one event per update
+aggregator = Aggregator()
+_frames_started = False
+_frames_lock = threading.Lock()
+
+def ensure_frames():
+    """Starts emit_frames() once, however the app was launched (socketio.run, flask run, gunicorn)."""
+    global _frames_started
+    with _frames_lock:
+        if not _frames_started:
+            _frames_started = True
+            socketio.start_background_task(emit_frames)
 
 @app.route("/")
 def index():
@@ -17,11 +33,39 @@ def index():
 @app.route("/update", methods=["POST"])
 def update():
     """Endpoint called by the data source to push new data to the dashboard."""
-    data = request.json
-    # Emit data to all connected clients via Socket.IO
-    socketio.emit("update", data)
+    data = request.get_json(silent=True)
+    # The node pushes batches (a JSON list); single objects are still accepted
+    items = data if isinstance(data, list) else [data]
+    if not all(isinstance(item, dict) for item in items):
+        return jsonify({"ok": False, "error": "expected a JSON object or a list of objects"}), 400
+    ensure_frames()
+    # Folded into the rolling aggregates; emit_frames() sends them on
+    for item in items:
+        if item.get("type") == "telemetry":
+            aggregator.set_telemetry(item)
+        else:
+            aggregator.add(item)
     return "OK"
 
+@app.route("/state", methods=["GET"])
+def state():
+    """Current aggregates and high-priority feed (what a browser receives on connect)."""
+    return jsonify(aggregator.snapshot(full=True))
+
+@socketio.on("connect")
+def on_connect():
+    ensure_frames()
+    # Start the new browser from the current state rather than empty charts
+    emit("state", aggregator.snapshot(full=True))
+
+def emit_frames():
+    """Pushes one compact snapshot to every browser per frame, only when something changed."""
+    while True:
+        socketio.sleep(1.0 / FRAME_HZ)
+        frame = aggregator.frame()
+        if frame is not None:
+            socketio.emit("snapshot", frame)
+
 @app.route("/override", methods=["POST"])
 def override():
     """Endpoint for the dashboard to send manual override commands to the Node API."""
@@ -42,6 +86,19 @@ def override():
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
+@app.route("/search", methods=["GET"])
+def search():
+    """Transcript search, forwarded to the Node API with the same query string."""
+    try:
+        r = requests.get(NODE_SEARCH_URL, params=request.args, timeout=5.0)
+        if 'application/json' in r.headers.get('Content-Type', ''):
+            return jsonify(r.json()), r.status_code
+        return jsonify({"ok": False, "error": f"Node API returned non-JSON response or status {r.status_code}", "detail": r.text}), 500
+    except requests.exceptions.ConnectionError:
+        return jsonify({"ok": False, "error": "Could not connect to Node API (port 8000). Is it running?"}), 503
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
 if __name__ == "__main__":
     print("Starting dashboard on http://0.0.0.0:5000")
     # Use socketio.run for integrated WebSocket and Flask serving
@@ -0,0 +1,214 @@
+# node/analysis.py
+"""
+Sentiment and priority analysis stage.
+
+Transcripts are queued from process_chunk and analysed in small batches on a
+dedicated thread, so neither sentiment scoring nor model initialisation ever
+runs on the event loop. Sentiment comes from TextBlob or VADER; priority
+keywords and phrases are compiled into one case-insensitive, word-bounded
+regex built from a JSON rule file that is reloaded when it changes.
+"""
+import asyncio, json, os, re, time
+from concurrent.futures import ThreadPoolExecutor
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "priority_rules.json")
+RELOAD_CHECK_SECS = 2.0
+BACKENDS = ("textblob", "vader")
+
+# Used when the rule file is missing or invalid
+DEFAULT_RULES = {
+    "keywords": {"help": 10, "emergency": 10, "urgent": 10, "accident": 10, "fire": 10, "hospital": 10},
+    "negative_threshold": -0.6,
+    "negative_priority": 7,
+    "default_priority": 1
+}
+
+def sentiment_label(polarity):
+    return "positive" if polarity > 0.1 else "negative" if polarity < -0.1 else "neutral"
+
+# ================== Sentiment ==================
+def load_sentiment(backend):
+    """Returns a callable text -> polarity in [-1, 1]."""
+    if backend == "vader":
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        analyzer = SentimentIntensityAnalyzer()
+        return lambda text: analyzer.polarity_scores(text)["compound"]
+    if backend == "textblob":
+        from textblob import TextBlob
+        TextBlob("warm up").sentiment  # loads the lexicon now rather than on the first chunk
+        return lambda text: TextBlob(text).sentiment.polarity
+    raise ValueError(f"unknown sentiment backend '{backend}'")
+
+# ================== Priority Rules ==================
+class PriorityRules:
+    """Keyword/phrase -> priority map compiled into a single word-bounded regex."""
+
+    def __init__(self, rules=None):
+        rules = rules or DEFAULT_RULES
+        # Keys are normalised the way matches() normalises hits: lowercase, single-spaced
+        self.keywords = {" ".join(k.lower().split()): int(v) for k, v in rules.get("keywords", {}).items()}
+        self.keywords.pop("", None)
+        self.negative_threshold = float(rules.get("negative_threshold", DEFAULT_RULES["negative_threshold"]))
+        self.negative_priority = int(rules.get("negative_priority", DEFAULT_RULES["negative_priority"]))
+        self.default_priority = int(rules.get("default_priority", DEFAULT_RULES["default_priority"]))
+        # Longest phrases first so "fire alarm" wins over "fire"; spaces match any whitespace
+        phrases = sorted(self.keywords, key=len, reverse=True)
+        alternation = "|".join(r"\s+".join(map(re.escape, p.split())) for p in phrases)
+        self._pattern = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE) if phrases else None
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def matches(self, text):
+        if self._pattern is None:
+            return []
+        return [" ".join(m.lower().split()) for m in self._pattern.findall(text)]
+
+    def priority(self, text, polarity):
+        """Returns (priority, matched keywords)."""
+        found = self.matches(text)
+        if found:
+            return max(self.keywords[k] for k in found), found
+        if polarity < self.negative_threshold:
+            return self.negative_priority, found
+        return self.default_priority, found
+
+class RuleFile:
+    """PriorityRules backed by a JSON file, reloaded when its mtime changes."""
+
+    def __init__(self, path=RULES_PATH, check_secs=RELOAD_CHECK_SECS):
+        self.path = path
+        self.check_secs = check_secs
+        self.reloads = 0
+        self._mtime = None
+        self._checked = 0.0
+        self.rules = PriorityRules()
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_secs:
+            return self.rules
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return self.rules
+        if mtime == self._mtime:
+            return self.rules
+        self._mtime = mtime
+        try:
+            self.rules = PriorityRules.load(self.path)
+            self.reloads += 1
+            print(f"Priority rules loaded from {self.path} ({len(self.rules.keywords)} keywords).")
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"WARN: keeping previous priority rules; {self.path} is invalid: {e}")
+        return self.rules
+
+# ================== Stage ==================
+class AnalysisStage:
+    """
+    Micro-batches transcripts (window_ms / max_batch_size, like the
+    transcription batcher) and analyses each batch on one background thread.
+    """
+
+    def __init__(self, backend="textblob", rules_path=RULES_PATH, window_ms=20, max_batch_size=32):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown sentiment backend '{backend}'")
+        self.backend = backend
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.rule_file = RuleFile(rules_path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+        self._sentiment = None
+        self._pending = []  # (text, queued_at, future)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.stats = {"batches": 0, "texts": 0, "max_batch": 0, "wait_secs": 0.0,
+                      "sentiment_secs": 0.0, "rules_secs": 0.0}
+
+    async def start(self):
+        """Loads the sentiment backend on the analysis thread, then starts batching."""
+        loop = asyncio.get_running_loop()
+        started = time.time()
+        self._sentiment = await loop.run_in_executor(self._executor, load_sentiment, self.backend)
+        print(f"Analysis stage ready: {self.backend} sentiment (loaded in {time.time() - started:.2f}s)")
+        self._task = asyncio.create_task(self._collect_loop())
+        return self
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    def depth(self):
+        return len(self._pending)
+
+    async def analyze(self, text):
+        """Returns {"polarity", "sentiment", "priority", "keywords"} for one transcript."""
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((text, time.time(), fut))
+        self._wakeup.set()
+        return await fut
+
+    async def _next_batch(self):
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        if len(self._pending) < self.max_batch_size:
+            await asyncio.sleep(self.window)
+        batch = self._pending[:self.max_batch_size]
+        del self._pending[:self.max_batch_size]
+        return batch
+
+    async def _collect_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            started = time.time()
+            try:
+                results, timings = await loop.run_in_executor(
+                    self._executor, self._analyze_batch, [text for text, _, _ in batch])
+            except Exception as e:
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, _, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(batch)
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            self.stats["wait_secs"] += sum(started - queued for _, queued, _ in batch)
+            self.stats["sentiment_secs"] += timings["sentiment_secs"]
+            self.stats["rules_secs"] += timings["rules_secs"]
+
+    def _analyze_batch(self, texts):
+        """Runs on the analysis thread. Returns (results, per-step timings)."""
+        rules = self.rule_file.refresh()
+        t0 = time.perf_counter()
+        polarities = [self._sentiment(text) for text in texts]
+        t1 = time.perf_counter()
+        results = []
+        for text, polarity in zip(texts, polarities):
+            priority, keywords = rules.priority(text, polarity)
+            results.append({"polarity": polarity, "sentiment": sentiment_label(polarity),
+                            "priority": priority, "keywords": keywords})
+        t2 = time.perf_counter()
+        return results, {"sentiment_secs": t1 - t0, "rules_secs": t2 - t1}
+
+    def timings(self):
+        """Average milliseconds per transcript for each step."""
+        n = self.stats["texts"] or 1
+        return {
+            "wait_ms": 1000 * self.stats["wait_secs"] / n,
+            "sentiment_ms": 1000 * self.stats["sentiment_secs"] / n,
+            "rules_ms": 1000 * self.stats["rules_secs"] / n
+        }
@@ -0,0 +1,200 @@
+# node/asr_engines.py
+"""
+Pluggable speech-to-text engines.
+
+Every engine exposes the same small interface so the worker pool does not care
+which backend is loaded:
+
+    whisper         openai-whisper (PyTorch); batched decode for clips <= 30s
+    faster-whisper  CTranslate2 with int8 weights on CPU, typically several
+                    times faster than the PyTorch path on CPU-only nodes
+    stub            no model; returns a deterministic transcript derived from
+                    the audio, for tests and load benchmarks
+
+Each engine records its model load time and the audio/compute seconds it has
+processed, so the real-time factor (compute secs / audio secs) can be reported.
+"""
+import hashlib, time
+import numpy as np
+
+SAMPLE_RATE = 16000
+INITIAL_PROMPT = "No Transcribed text"
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+STUB_SILENCE_RMS = 0.01
+STUB_WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+              "india", "juliet", "kilo", "lima", "mike", "november", "oscar", "papa")
+
+class ASREngine:
+    """Base class. Subclasses implement _load() and _transcribe(); _transcribe_batch() is optional."""
+
+    name = "base"
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.device = "cpu"
+        self.load_secs = 0.0
+        self.audio_secs = 0.0
+        self.compute_secs = 0.0
+
+    def load(self):
+        start = time.time()
+        self._load()
+        self.load_secs = time.time() - start
+        return self
+
+    def rtf(self):
+        """Real-time factor so far: below 1.0 means faster than real time."""
+        return self.compute_secs / self.audio_secs if self.audio_secs else 0.0
+
+    def transcribe_batch(self, audios):
+        """float32 16 kHz clips -> (list of texts, compute seconds for the whole batch)."""
+        start = time.time()
+        texts = self._transcribe_batch(audios)
+        secs = time.time() - start
+        self.audio_secs += sum(len(a) for a in audios) / SAMPLE_RATE
+        self.compute_secs += secs
+        return texts, secs
+
+    def _transcribe_batch(self, audios):
+        texts = []
+        for audio in audios:
+            try:
+                texts.append(self._transcribe(audio))
+            except Exception as e:
+                print(f"{self.name} transcription failed: {e}")
+                texts.append("")
+        return texts
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _transcribe(self, audio):
+        raise NotImplementedError
+
+class WhisperEngine(ASREngine):
+
+    name = "whisper"
+    OPTIONS = {
+        "without_timestamps": True,
+        "initial_prompt": INITIAL_PROMPT,
+        "logprob_threshold": LOGPROB_THRESHOLD,
+        "temperature": 0.0,
+        "suppress_tokens": "-1"
+    }
+
+    def _load(self):
+        import whisper
+        import torch
+
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._model = whisper.load_model(self.model_name, device=self.device)
+
+    def _transcribe(self, audio):
+        return self._model.transcribe(audio, **self.OPTIONS).get("text", "").strip()
+
+    def _decode(self, audios):
+        """One batched Whisper forward pass over clips that fit in a single 30s window."""
+        import whisper
+        import torch
+
+        n_mels = getattr(self._model.dims, "n_mels", 80)
+        mels = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(a), n_mels) for a in audios])
+        options = whisper.DecodingOptions(
+            without_timestamps=True,
+            prompt=INITIAL_PROMPT,
+            temperature=self.OPTIONS["temperature"],
+            suppress_tokens=self.OPTIONS["suppress_tokens"],
+            fp16=(self.device == "cuda"),
+        )
+        texts = []
+        for r in whisper.decode(self._model, mels.to(self._model.device), options):
+            # Same no-speech rule transcribe() applies to its segments
+            silent = r.no_speech_prob > NO_SPEECH_THRESHOLD and r.avg_logprob < LOGPROB_THRESHOLD
+            texts.append("" if silent else r.text.strip())
+        return texts
+
+    def _transcribe_batch(self, audios):
+        import whisper
+
+        short = [i for i, a in enumerate(audios) if len(a) <= whisper.audio.N_SAMPLES]
+        texts = [None] * len(audios)
+        try:
+            if short:
+                for i, text in zip(short, self._decode([audios[i] for i in short])):
+                    texts[i] = text
+        except Exception as e:
+            print(f"Batched decode failed, falling back per chunk: {e}")
+            texts = [None] * len(audios)
+        # Clips longer than one window (or a failed batch) go through transcribe()
+        rest = [i for i, t in enumerate(texts) if t is None]
+        for i, text in zip(rest, super()._transcribe_batch([audios[i] for i in rest])):
+            texts[i] = text
+        return texts
+
+class FasterWhisperEngine(ASREngine):
+
+    name = "faster-whisper"
+    COMPUTE_TYPE = "int8"   # int8 weights; the CTranslate2 CPU sweet spot
+    BEAM_SIZE = 1
+
+    def __init__(self, model_name, compute_type=None, cpu_threads=0):
+        super().__init__(model_name)
+        self.compute_type = compute_type or self.COMPUTE_TYPE
+        self.cpu_threads = cpu_threads  # 0 = CTranslate2 default
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+
+        self._model = WhisperModel(self.model_name, device=self.device, compute_type=self.compute_type,
+                                   cpu_threads=self.cpu_threads, num_workers=1)
+
+    def _transcribe(self, audio):
+        segments, _ = self._model.transcribe(
+            audio,
+            beam_size=self.BEAM_SIZE,
+            temperature=0.0,
+            initial_prompt=INITIAL_PROMPT,
+            without_timestamps=True,
+            log_prob_threshold=LOGPROB_THRESHOLD,
+            no_speech_threshold=NO_SPEECH_THRESHOLD,
+            condition_on_previous_text=False,
+        )
+        # segments is lazy; decoding happens while it is consumed
+        return " ".join(s.text.strip() for s in segments).strip()
+
+class StubEngine(ASREngine):
+    """
+    Deterministic fake: silent clips give "", anything else gives a few words
+    chosen from a hash of the samples, so the same audio always yields the same
+    text. decode_rtf adds a simulated compute cost per second of audio.
+    """
+
+    name = "stub"
+
+    def __init__(self, model_name, decode_rtf=0.0):
+        super().__init__(model_name)
+        self.decode_rtf = decode_rtf
+
+    def _load(self):
+        pass
+
+    def _transcribe(self, audio):
+        audio = np.asarray(audio, dtype=np.float32)
+        if self.decode_rtf:
+            time.sleep(len(audio) / SAMPLE_RATE * self.decode_rtf)
+        if not len(audio) or float(np.sqrt(np.mean(audio ** 2))) < STUB_SILENCE_RMS:
+            return ""
+        digest = hashlib.sha1(audio.tobytes()).digest()
+        n_words = 3 + int(len(audio) / SAMPLE_RATE)
+        return " ".join(STUB_WORDS[digest[i % len(digest)] % len(STUB_WORDS)] for i in range(n_words))
+
+ENGINES = {cls.name: cls for cls in (WhisperEngine, FasterWhisperEngine, StubEngine)}
+
+def create_engine(name, model_name, **options):
+    """Returns an unloaded engine; call .load() in the process that will use it."""
+    try:
+        cls = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"unknown ASR engine '{name}' (choose from {', '.join(ENGINES)})")
+    return cls(model_name, **options)
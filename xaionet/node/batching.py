@@ -0,0 +1,135 @@
+# node/batching.py
+"""
+Cross-session micro-batching in front of the transcription pool.
+
+Chunks from any session that arrive within a short window (or until the batch
+is full) are decoded together in one batched engine call, and each
+result is handed back to the process_chunk call that submitted it. Pending
+chunks are picked by session priority (with aging), not arrival order.
+"""
+import asyncio, itertools, time
+from worker_pool import transcribe_batch_in_worker, share_audio, release_audio
+from scheduler import effective_priority
+
+class TranscriptionBatcher:
+    """
+    window_ms is the throughput-vs-latency knob: a larger window forms bigger
+    batches at the cost of up to window_ms extra wait for the first chunk.
+    When every worker is busy, whatever has queued up is batched immediately.
+    """
+
+    def __init__(self, pool, window_ms=50, max_batch_size=8):
+        self.pool = pool
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._pending = []  # (priority, queued_at, seq, samples, future)
+        self._wakeup = asyncio.Event()
+        self._seq = itertools.count()
+        # One batch in flight per worker; extra chunks wait here and batch up.
+        self._slots = asyncio.Semaphore(pool.max_workers)
+        self._task = None
+        self.running = 0       # batches currently on a worker
+        self.busy_secs = 0.0   # summed batch round-trip time, for worker utilisation
+        self.stats = {"batches": 0, "chunks": 0, "wait_secs": 0.0, "decode_secs": 0.0, "max_batch": 0,
+                      "audio_secs": 0.0, "compute_secs": 0.0}
+
+    def start(self):
+        self._task = asyncio.create_task(self._collect_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def depth(self):
+        return len(self._pending)
+
+    async def transcribe(self, samples, priority=1):
+        """Queues float32 samples for a batch and waits for its result."""
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((priority, time.time(), next(self._seq), samples, fut))
+        self._wakeup.set()
+        return await fut
+
+    async def _wait_for_pending(self, timeout=None):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _next_batch(self):
+        while not self._pending:
+            await self._wait_for_pending()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(self._pending) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await self._wait_for_pending(remaining)
+        # Most urgent first; aging lets long-waiting routine chunks catch up.
+        now = time.time()
+        self._pending.sort(key=lambda it: (-effective_priority(it[0], it[1], now), it[2]))
+        batch = [(samples, fut, queued) for _, queued, _, samples, fut in self._pending[:self.max_batch_size]]
+        del self._pending[:self.max_batch_size]
+        return batch
+
+    async def _collect_loop(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._next_batch()
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            asyncio.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        started = time.time()
+        live = [(samples, fut, queued) for samples, fut, queued in batch if not fut.done()]
+        blocks, refs = [], []
+        self.running += 1
+        try:
+            for samples, _, _ in live:
+                shm, ref = share_audio(samples)
+                blocks.append(shm)
+                refs.append(ref)
+            results = await self.pool.run(transcribe_batch_in_worker, refs) if refs else []
+            worker_secs = time.time() - started
+            for (_, fut, queued), result in zip(live, results):
+                self.stats["audio_secs"] += result.get("audio_secs", 0.0)
+                self.stats["compute_secs"] += result.get("compute_secs", 0.0)
+                result["batch_wait_secs"] = started - queued
+                result["worker_secs"] = worker_secs
+                if not fut.done():
+                    fut.set_result(result)
+        except Exception as e:
+            for _, fut, _ in live:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            for shm in blocks:
+                release_audio(shm)
+            self._slots.release()
+            self.running -= 1
+
+        decode_secs = time.time() - started
+        self.busy_secs += decode_secs
+        wait_secs = sum(started - queued for _, _, queued in live)
+        self.stats["batches"] += 1
+        self.stats["chunks"] += len(live)
+        self.stats["wait_secs"] += wait_secs
+        self.stats["decode_secs"] += decode_secs
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(live))
+        if live:
+            print(f"Batch: {len(live)} chunk(s), avg wait {1000 * wait_secs / len(live):.0f}ms, "
+                  f"decoded in {decode_secs:.2f}s (avg batch {self.stats['chunks'] / self.stats['batches']:.2f}, "
+                  f"RTF {self.rtf():.2f})")
+
+    def rtf(self):
+        """Engine compute seconds per second of audio, across all batches so far."""
+        return self.stats["compute_secs"] / self.stats["audio_secs"] if self.stats["audio_secs"] else 0.0
@@ -0,0 +1,92 @@
+# node/dashboard_push.py
+"""
+Persistent, coalescing push channel from the node to the dashboard.
+
+process_chunk only appends to a bounded buffer. A dedicated thread keeps one
+keep-alive HTTP session to dashboard/app.py and POSTs everything buffered as a
+single JSON list at a fixed rate. While the dashboard is down the buffer keeps
+the newest updates and drops the oldest.
+"""
+import threading
+from collections import deque
+import requests
+
+PUSH_HZ = 4.0
+BUFFER_SIZE = 500
+TIMEOUT_SECS = 0.5
+MAX_BACKOFF_SECS = 5.0
+
+class DashboardPusher:
+
+    def __init__(self, url, push_hz=PUSH_HZ, buffer_size=BUFFER_SIZE):
+        self.url = url
+        self.interval = 1.0 / push_hz
+        self.buffer_size = buffer_size
+        self.sent = 0
+        self.dropped = 0
+        self.failures = 0
+        self._down = False
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dashboard-push", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def publish(self, payload):
+        """Queues one update; never blocks on the network."""
+        with self._lock:
+            self._buffer.append(payload)
+            self._trim()
+
+    def pending(self):
+        return len(self._buffer)
+
+    def close(self, timeout=2):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _trim(self):
+        while len(self._buffer) > self.buffer_size:
+            self._buffer.popleft()
+            self.dropped += 1
+
+    def _take(self):
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        return batch
+
+    def _put_back(self, batch):
+        with self._lock:
+            self._buffer.extendleft(reversed(batch))
+            self._trim()
+
+    def _run(self):
+        session = requests.Session()  # keep-alive: one TCP connection reused for every push
+        backoff = self.interval
+        try:
+            while not self._stop.wait(backoff):
+                batch = self._take()
+                if not batch:
+                    backoff = self.interval
+                    continue
+                try:
+                    r = session.post(self.url, json=batch, timeout=TIMEOUT_SECS)
+                    r.raise_for_status()
+                    self.sent += len(batch)
+                    backoff = self.interval
+                    if self._down:
+                        print("Dashboard reachable again; push channel resumed.")
+                        self._down = False
+                except Exception as e:
+                    self.failures += 1
+                    self._put_back(batch)
+                    if not self._down:
+                        print(f"Dashboard push failed ({e}); buffering up to {self.buffer_size} updates.")
+                        self._down = True
+                    backoff = min(backoff * 2, MAX_BACKOFF_SECS)
+        finally:
+            session.close()
@@ -0,0 +1,208 @@
+# node/db_writer.py
+"""
+Write-behind logger for the logs table.
+
+A dedicated thread owns one long-lived SQLite connection in WAL mode and
+inserts queued rows in multi-row transactions, committing whenever
+BATCH_SIZE rows are pending or FLUSH_INTERVAL_SECS has passed. The event loop
+only ever appends to an in-memory queue.
+
+The stages column holds optional per-stage timings (JSON, milliseconds) for
+the chunk; it is NULL unless the node runs with stage persistence enabled.
+
+logs_fts is an external-content FTS5 index over logs.text. Triggers keep it
+in step with every insert, update and delete (including rows retention.py
+archives), so the writer thread needs no extra work.
+"""
+import queue, sqlite3, threading, time
+
+BATCH_SIZE = 200
+FLUSH_INTERVAL_SECS = 0.5
+
+LOG_COLUMNS = ("session_id", "capture_ts", "transcribe_ts", "forward_ts",
+               "audio_bytes", "text_bytes", "text", "sentiment", "priority", "stages")
+
+INSERT_LOG = (f"INSERT INTO logs({','.join(LOG_COLUMNS)}) "
+              f"VALUES ({','.join('?' * len(LOG_COLUMNS))})")
+
+def init_db(db_path):
+    """Creates the node's tables if needed and switches the database to WAL."""
+    # New databases free pages incrementally (retention.py); this must precede WAL and the first table
+    conn = sqlite3.connect(db_path)
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.close()
+    conn = connect(db_path)
+    conn.execute("""CREATE TABLE IF NOT EXISTS logs(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT,
+        capture_ts REAL,
+        transcribe_ts REAL,
+        forward_ts REAL,
+        audio_bytes INTEGER,
+        text_bytes INTEGER,
+        text TEXT,
+        sentiment REAL,
+        priority INTEGER,
+        stages TEXT
+    )""")
+    # Databases created before the stages column existed
+    if "stages" not in {r[1] for r in conn.execute("PRAGMA table_info(logs)")}:
+        conn.execute("ALTER TABLE logs ADD COLUMN stages TEXT")
+    # Keyset pagination and time-range aggregation in node_api.py; id breaks capture_ts ties
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs(capture_ts, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_session_ts ON logs(session_id, capture_ts, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_priority_ts ON logs(priority, capture_ts, id)")
+    init_fts(conn)
+    conn.execute("""CREATE TABLE IF NOT EXISTS overrides(
+        session_id TEXT PRIMARY KEY,
+        priority INTEGER,
+        ts REAL
+    )""")
+    init_override_version(conn)
+    # Retention tiers (see retention.py): per-session, per-minute rollups of every
+    # log row, and the manifest of compressed archive files holding aged-out rows.
+    conn.execute("""CREATE TABLE IF NOT EXISTS log_rollups(
+        session_id TEXT,
+        minute_ts INTEGER,
+        chunks INTEGER,
+        audio_bytes INTEGER,
+        text_bytes INTEGER,
+        priority_sum INTEGER,
+        priority_max INTEGER,
+        high_priority INTEGER,
+        polarity_sum REAL,
+        positive INTEGER,
+        neutral INTEGER,
+        negative INTEGER,
+        latency_sum REAL,
+        latency_max REAL,
+        PRIMARY KEY (session_id, minute_ts)
+    ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rollups_minute ON log_rollups(minute_ts)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS archive_files(
+        path TEXT PRIMARY KEY,
+        min_ts REAL,
+        max_ts REAL,
+        min_id INTEGER,
+        max_id INTEGER,
+        rows INTEGER,
+        bytes INTEGER,
+        sessions TEXT,
+        created_ts REAL
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_ts ON archive_files(max_ts, min_ts)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS retention_state(
+        key TEXT PRIMARY KEY,
+        value REAL
+    )""")
+    conn.commit()
+    conn.close()
+
+def init_override_version(conn):
+    """Single-row counter bumped by triggers on every overrides change (see overrides.watch_overrides)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS override_version(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""")
+    conn.execute("INSERT OR IGNORE INTO override_version(id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS overrides_version_{event.lower()} AFTER {event} ON overrides BEGIN
+            UPDATE override_version SET version = version + 1 WHERE id = 1;
+        END""")
+
+def init_fts(conn):
+    """Creates logs_fts and its sync triggers; indexes existing rows the first time."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'logs_fts'").fetchone()
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+        text, content='logs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs BEGIN
+        INSERT INTO logs_fts(rowid, text) VALUES (new.id, new.text);
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs BEGIN
+        INSERT INTO logs_fts(logs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS logs_fts_update AFTER UPDATE OF text ON logs BEGIN
+        INSERT INTO logs_fts(logs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO logs_fts(rowid, text) VALUES (new.id, new.text);
+    END""")
+    if not exists:
+        conn.execute("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')")
+
+def connect(db_path):
+    """Opens a connection configured for concurrent readers and one fast writer."""
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class LogWriter:
+    """Batches log rows on a background thread; call close() to flush on shutdown."""
+
+    _STOP = object()
+
+    def __init__(self, db_path, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL_SECS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.batches_written = 0
+        self.errors = 0
+        self.flush_secs = 0.0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def write(self, row):
+        """Queues one row (a tuple in LOG_COLUMNS order). Never blocks."""
+        self._queue.put(row)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=10):
+        """Flushes everything queued so far and stops the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _flush(self, conn, rows):
+        started = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(INSERT_LOG, rows)
+            self.rows_written += len(rows)
+            self.batches_written += 1
+            self.flush_secs += time.perf_counter() - started
+        except Exception as e:
+            self.errors += 1
+            print(f"DB insertion error ({len(rows)} rows lost): {e}")
+
+    def _run(self):
+        conn = connect(self.db_path)
+        rows = []
+        stopping = False
+        deadline = None
+        try:
+            while not stopping:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                    if item is self._STOP:
+                        stopping = True
+                    else:
+                        rows.append(item)
+                        if deadline is None:
+                            deadline = time.monotonic() + self.flush_interval
+                except queue.Empty:
+                    pass
+                if rows and (stopping or len(rows) >= self.batch_size or time.monotonic() >= deadline):
+                    self._flush(conn, rows)
+                    rows = []
+                    deadline = None
+        finally:
+            conn.close()
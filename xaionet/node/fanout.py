@@ -0,0 +1,134 @@
+# node/fanout.py
+"""
+Receiver fan-out.
+
+Every receiver gets a bounded outbound queue drained by its own writer task,
+so one slow receiver never delays a chunk or the other receivers. Receivers
+can subscribe to specific sessions and/or a minimum priority; each payload is
+serialized once and the same string is queued to every matching receiver.
+"""
+import asyncio, json
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+def parse_filters(msg):
+    """(sessions, min_priority) from a receiver's register/subscribe message; ValueError if malformed."""
+    sessions = msg.get("sessions")
+    if sessions is not None and (not isinstance(sessions, list) or not all(isinstance(s, str) for s in sessions)):
+        raise ValueError("sessions must be a list of session ids")
+    try:
+        min_priority = int(msg.get("min_priority") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("min_priority must be an integer") from None
+    return sessions, min_priority
+
+class Subscriber:
+
+    def __init__(self, ws, sessions=None, min_priority=0, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.ws = ws
+        self.sessions = set(sessions) if sessions else None  # None = all sessions
+        self.min_priority = min_priority
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._task = asyncio.create_task(self._writer())
+
+    def lag(self):
+        """Messages queued for this receiver but not yet written to its socket."""
+        return self._queue.qsize()
+
+    def offer(self, msg):
+        if self._queue.full():
+            self._queue.get_nowait()  # slow receiver: keep the newest messages
+            self.dropped += 1
+        self._queue.put_nowait(msg)
+
+    async def _writer(self):
+        try:
+            while True:
+                msg = await self._queue.get()
+                await self.ws.send(msg)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.closed = True
+
+    def close(self):
+        self.closed = True
+        self._task.cancel()
+
+class FanOut:
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = {}    # ws -> Subscriber
+        self._all_sessions = set()
+        self._by_session = {}     # session_id -> set of Subscribers
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, ws, sessions=None, min_priority=0):
+        """Adds a receiver, or updates its filters if it is already subscribed."""
+        old = self._subscribers.get(ws)
+        if old is not None:
+            self._unindex(old)
+            old.sessions = set(sessions) if sessions else None
+            old.min_priority = min_priority
+            self._index(old)
+            return old
+        sub = Subscriber(ws, sessions, min_priority, self.queue_size)
+        self._subscribers[ws] = sub
+        self._index(sub)
+        return sub
+
+    def unsubscribe(self, ws):
+        sub = self._subscribers.pop(ws, None)
+        if sub is not None:
+            self._unindex(sub)
+            sub.close()
+
+    def _index(self, sub):
+        if sub.sessions is None:
+            self._all_sessions.add(sub)
+        else:
+            for sid in sub.sessions:
+                self._by_session.setdefault(sid, set()).add(sub)
+
+    def _unindex(self, sub):
+        self._all_sessions.discard(sub)
+        for sid in sub.sessions or ():
+            subs = self._by_session.get(sid)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_session[sid]
+
+    def publish(self, payload):
+        """Queues one semantic payload to every matching receiver. Never awaits.
+
+        Returns (receivers it was queued to, size of the encoded message), so
+        callers can account for the bytes without serializing again.
+        """
+        msg = json.dumps({"type": "semantic", "payload": payload})
+        targets = self._all_sessions.union(self._by_session.get(payload.get("session_id"), ()))
+        priority = payload.get("priority", 0)
+        delivered = 0
+        for sub in targets:
+            if sub.closed:
+                self.unsubscribe(sub.ws)
+            elif priority >= sub.min_priority:
+                sub.offer(msg)
+                delivered += 1
+        return delivered, len(msg)
+
+    def stats(self):
+        subs = list(self._subscribers.values())
+        return {
+            "receivers": len(subs),
+            "lag_total": sum(s.lag() for s in subs),
+            "lag_max": max((s.lag() for s in subs), default=0),
+            "dropped": sum(s.dropped for s in subs)
+        }
@@ -0,0 +1,270 @@
+# node/log_queries.py
+"""
+Read-side queries over the logs table for node_api.py.
+
+Listing uses keyset pagination on (capture_ts, id), newest first, so every
+page is an index range scan no matter how deep the caller pages; the cursor
+is the last row's position, never an OFFSET. Aggregations (per-session
+counts, latency percentiles, priority/sentiment distributions per time
+bucket) run entirely in SQL and return only the aggregated numbers.
+Transcript search goes through the logs_fts index (see db_writer.py).
+"""
+import base64, json, re, sqlite3, time
+
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_WINDOW_SECS = 24 * 3600   # aggregations default to the last day
+MAX_BUCKETS = 2000
+PERCENTILES = (50, 95, 99)
+# Same thresholds analysis.py uses for the sentiment label
+POSITIVE_POLARITY = 0.1
+NEGATIVE_POLARITY = -0.1
+
+LOG_FIELDS = ("id", "session_id", "capture_ts", "transcribe_ts", "forward_ts",
+              "audio_bytes", "text_bytes", "text", "sentiment", "priority", "stages")
+
+LATENCY_METRICS = {
+    "capture_to_forward": "forward_ts - capture_ts",
+    "capture_to_transcribe": "transcribe_ts - capture_ts",
+    "transcribe_to_forward": "forward_ts - transcribe_ts"
+}
+
+# Wrapped around matched terms in search snippets; control characters so they
+# can't collide with transcript text (the dashboard swaps them for <mark>)
+HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE = "\x02", "\x03"
+SNIPPET_TOKENS = 16
+SEARCH_ORDERS = ("rank", "recent")
+RANK_CANDIDATES = 10000   # newest matches a ranked search scores
+NO_ROWS = 2 ** 63 - 1     # id floor that matches nothing
+
+SENTIMENT_LABEL_SQL = (f"CASE WHEN sentiment > {POSITIVE_POLARITY} THEN 'positive' "
+                       f"WHEN sentiment < {NEGATIVE_POLARITY} THEN 'negative' ELSE 'neutral' END")
+
+def encode_cursor(capture_ts, row_id):
+    return base64.urlsafe_b64encode(json.dumps([capture_ts, row_id]).encode()).decode()
+
+def decode_cursor(cursor):
+    """Raises ValueError on a malformed cursor."""
+    try:
+        capture_ts, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(capture_ts), int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def _filters(session_id=None, since=None, until=None, priority=None, min_priority=None):
+    """WHERE clauses and parameters shared by every query."""
+    where, params = [], []
+    if session_id is not None:
+        where.append("session_id = ?")
+        params.append(session_id)
+    if since is not None:
+        where.append("capture_ts >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("capture_ts < ?")
+        params.append(until)
+    if priority is not None:
+        where.append("priority = ?")
+        params.append(priority)
+    if min_priority is not None:
+        where.append("priority >= ?")
+        params.append(min_priority)
+    return where, params
+
+def _where_sql(where):
+    return (" WHERE " + " AND ".join(where)) if where else ""
+
+def list_logs(conn, session_id=None, since=None, until=None, priority=None, min_priority=None,
+              limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """One page of rows, newest first. Returns (rows, next_cursor or None)."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    where, params = _filters(session_id, since, until, priority, min_priority)
+    if cursor:
+        where.append("(capture_ts, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    sql = (f"SELECT {','.join(LOG_FIELDS)} FROM logs{_where_sql(where)} "
+           f"ORDER BY capture_ts DESC, id DESC LIMIT ?")
+    rows = [dict(zip(LOG_FIELDS, r)) for r in conn.execute(sql, params + [limit + 1])]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["capture_ts"], rows[-1]["id"])
+    for row in rows:
+        if row["stages"]:
+            row["stages"] = json.loads(row["stages"])
+    return rows, next_cursor
+
+def default_window(since, until, window=DEFAULT_WINDOW_SECS):
+    until = time.time() if until is None else until
+    since = until - window if since is None else since
+    return since, until
+
+def session_counts(conn, since=None, until=None, min_priority=None, limit=DEFAULT_PAGE_SIZE):
+    """Per-session chunk counts and summary numbers, busiest sessions first."""
+    since, until = default_window(since, until)
+    where, params = _filters(since=since, until=until, min_priority=min_priority)
+    sql = (f"SELECT session_id, COUNT(*), MIN(capture_ts), MAX(capture_ts), MAX(priority), AVG(priority), "
+           f"AVG(sentiment), SUM(audio_bytes), SUM(text_bytes), AVG(forward_ts - capture_ts) "
+           f"FROM logs{_where_sql(where)} GROUP BY session_id ORDER BY COUNT(*) DESC LIMIT ?")
+    keys = ("session_id", "chunks", "first_ts", "last_ts", "max_priority", "avg_priority",
+            "avg_polarity", "audio_bytes", "text_bytes", "avg_latency")
+    rows = conn.execute(sql, params + [max(1, min(int(limit), MAX_PAGE_SIZE))])
+    return {"since": since, "until": until, "sessions": [dict(zip(keys, r)) for r in rows]}
+
+def _bucket_size(since, until, bucket):
+    bucket = float(bucket)
+    if bucket <= 0:
+        raise ValueError("bucket must be positive")
+    if (until - since) / bucket > MAX_BUCKETS:
+        raise ValueError(f"too many buckets (max {MAX_BUCKETS}); widen the bucket or narrow the range")
+    return bucket
+
+def latency_percentiles(conn, metric="capture_to_forward", session_id=None, since=None, until=None, bucket=None):
+    """
+    Nearest-rank p50/p95/p99 (plus mean and max) of a latency metric, overall
+    or per time bucket, computed with window functions inside SQLite.
+    """
+    if metric not in LATENCY_METRICS:
+        raise ValueError(f"unknown metric '{metric}' (choose from {', '.join(LATENCY_METRICS)})")
+    since, until = default_window(since, until)
+    where, params = _filters(session_id, since, until)
+    where.append("forward_ts IS NOT NULL AND transcribe_ts IS NOT NULL")
+    if bucket:
+        size = _bucket_size(since, until, bucket)
+        bucket_sql, bucket_params = "CAST(capture_ts / ? AS INTEGER) * ?", [size, size]
+    else:
+        bucket_sql, bucket_params = "0", []
+    pct_sql = ", ".join(f"MAX(CASE WHEN rn = CAST({p / 100.0} * (n - 1) AS INTEGER) + 1 THEN lat END)"
+                        for p in PERCENTILES)
+    sql = (f"WITH l AS (SELECT {bucket_sql} AS b, {LATENCY_METRICS[metric]} AS lat FROM logs{_where_sql(where)}), "
+           f"r AS (SELECT b, lat, ROW_NUMBER() OVER (PARTITION BY b ORDER BY lat) AS rn, "
+           f"COUNT(*) OVER (PARTITION BY b) AS n FROM l) "
+           f"SELECT b, MAX(n), AVG(lat), MAX(lat), {pct_sql} FROM r GROUP BY b ORDER BY b")
+    keys = ("bucket_ts", "count", "mean", "max") + tuple(f"p{p}" for p in PERCENTILES)
+    rows = [dict(zip(keys, r)) for r in conn.execute(sql, bucket_params + params)]
+    if not bucket:
+        for row in rows:
+            row.pop("bucket_ts")
+    return {"metric": metric, "since": since, "until": until, "bucket": bucket or None,
+            "buckets" if bucket else "overall": rows if bucket else (rows[0] if rows else {"count": 0})}
+
+def distributions(conn, bucket=60, session_id=None, since=None, until=None):
+    """Per time bucket: chunk counts by priority and by sentiment label."""
+    since, until = default_window(since, until)
+    size = _bucket_size(since, until, bucket)
+    where, params = _filters(session_id, since, until)
+    bucket_sql = "CAST(capture_ts / ? AS INTEGER) * ?"
+    out = {}
+    for kind, column in (("priority", "priority"), ("sentiment", SENTIMENT_LABEL_SQL)):
+        sql = (f"SELECT {bucket_sql} AS b, {column} AS k, COUNT(*) FROM logs{_where_sql(where)} "
+               f"GROUP BY b, k ORDER BY b")
+        for b, k, n in conn.execute(sql, [size, size] + params):
+            entry = out.setdefault(b, {"bucket_ts": b, "total": 0, "priority": {}, "sentiment": {}})
+            entry[kind][str(k)] = n
+            if kind == "priority":
+                entry["total"] += n
+    return {"since": since, "until": until, "bucket": size, "buckets": [out[b] for b in sorted(out)]}
+
+def rollup_series(conn, bucket=60, session_id=None, since=None, until=None):
+    """
+    Per time bucket (a multiple of a minute) totals from log_rollups, which
+    outlive the raw rows moved to the archive by retention.py.
+    """
+    since, until = default_window(since, until)
+    size = max(60, int(_bucket_size(since, until, bucket)) // 60 * 60)
+    where, params = ["minute_ts >= ?", "minute_ts < ?"], [since // 60 * 60, until]
+    if session_id is not None:
+        where.append("session_id = ?")
+        params.append(session_id)
+    sql = (f"SELECT minute_ts / ? * ? AS b, SUM(chunks), SUM(audio_bytes), SUM(text_bytes), "
+           f"1.0 * SUM(priority_sum) / SUM(chunks), MAX(priority_max), SUM(high_priority), "
+           f"SUM(polarity_sum) / SUM(chunks), SUM(positive), SUM(neutral), SUM(negative), "
+           f"SUM(latency_sum) / SUM(chunks), MAX(latency_max), COUNT(DISTINCT session_id) "
+           f"FROM log_rollups{_where_sql(where)} GROUP BY b ORDER BY b")
+    keys = ("bucket_ts", "chunks", "audio_bytes", "text_bytes", "avg_priority", "max_priority",
+            "high_priority", "avg_polarity", "positive", "neutral", "negative", "avg_latency",
+            "max_latency", "sessions")
+    rows = conn.execute(sql, [size, size] + params)
+    return {"since": since, "until": until, "bucket": size, "buckets": [dict(zip(keys, r)) for r in rows]}
+
+def fts_query(q):
+    """
+    Turns free text into an FTS5 query: every word must match, words are taken
+    literally (no FTS operators), a trailing * keeps prefix matching and
+    "quoted phrases" match as phrases.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', q or ""):
+        prefix = word.endswith("*")
+        text = (phrase or word.rstrip("*")).replace('"', "")
+        if text.strip():
+            terms.append(f'"{text}"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError("empty search query")
+    return " AND ".join(terms)
+
+def _since_floor(conn, since):
+    """Lowest logs id captured at or after since, so FTS scans stop at the window's edge."""
+    if since is None:
+        return 0
+    # The (capture_ts, id) index makes this proportional to the window, not the table
+    floor = conn.execute("SELECT MIN(id) FROM logs INDEXED BY idx_logs_ts WHERE capture_ts >= ?",
+                         (since,)).fetchone()[0]
+    return NO_ROWS if floor is None else floor
+
+def _rank_floor(conn, where, params):
+    """Raises the floor to the RANK_CANDIDATES-th newest match so ranking cost stays flat as the corpus grows."""
+    row = conn.execute(f"SELECT f.rowid FROM logs_fts f CROSS JOIN logs l ON l.id = f.rowid"
+                       f"{_where_sql(where)} ORDER BY f.rowid DESC LIMIT 1 OFFSET ?",
+                       params + [RANK_CANDIDATES - 1]).fetchone()
+    return row[0] if row else params[-1]
+
+def search_logs(conn, q, session_id=None, since=None, until=None, min_priority=None,
+                order="rank", limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Transcript search over logs_fts. order="rank" sorts the newest
+    RANK_CANDIDATES matches by bm25 relevance, order="recent" returns every
+    match newest first. Returns (rows, next_cursor or None); each row carries
+    a snippet with the matches highlighted.
+    """
+    if order not in SEARCH_ORDERS:
+        raise ValueError(f"unknown order '{order}' (choose from {', '.join(SEARCH_ORDERS)})")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    match = fts_query(q)
+    where, params = _filters(session_id, since, until, min_priority=min_priority)
+    where = ["logs_fts MATCH ?"] + [f"l.{w}" for w in where] + ["f.rowid >= ?"]
+    try:
+        if order == "rank":
+            # The cursor pins the floor so later pages rank the same candidates;
+            # bm25 scores shift as rows arrive, so pages step by offset
+            if cursor:
+                floor, offset = decode_cursor(cursor)
+            else:
+                floor = _rank_floor(conn, where, [match] + params + [_since_floor(conn, since)])
+                offset = 0
+            params = [match] + params + [int(floor)]
+            order_sql, tail = "ORDER BY f.rank, f.rowid DESC LIMIT ? OFFSET ?", [limit + 1, offset]
+        else:
+            params = [match] + params + [_since_floor(conn, since)]
+            if cursor:
+                where.append("f.rowid < ?")
+                params.append(decode_cursor(cursor)[1])
+            order_sql, tail = "ORDER BY f.rowid DESC LIMIT ?", [limit + 1]
+        fields = ",".join(f"l.{f}" for f in LOG_FIELDS if f != "stages")
+        # CROSS JOIN keeps the FTS index as the driving table; otherwise the
+        # planner may walk a logs index and re-run the MATCH once per row
+        sql = (f"SELECT {fields}, f.rank, snippet(logs_fts, 0, ?, ?, '…', {SNIPPET_TOKENS}) "
+               f"FROM logs_fts f CROSS JOIN logs l ON l.id = f.rowid{_where_sql(where)} {order_sql}")
+        result = conn.execute(sql, [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE] + params + tail).fetchall()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"bad search query: {e}")
+    keys = tuple(f for f in LOG_FIELDS if f != "stages") + ("score", "snippet")
+    rows = [dict(zip(keys, r)) for r in result]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (encode_cursor(floor, offset + limit) if order == "rank"
+                       else encode_cursor(0, rows[-1]["id"]))
+    for row in rows:
+        row["score"] = -row["score"]  # bm25 is lower-is-better; report higher-is-better
+    return rows, next_cursor
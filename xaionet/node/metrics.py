@@ -0,0 +1,124 @@
+# node/metrics.py
+"""
+Node metrics in the Prometheus text format, without extra dependencies.
+
+Histograms are the only thing touched on the hot path (one bisect and two
+additions per observation). Gauges and counters are read from the objects
+that already keep them (queues, batcher, fan-out, log writer) through
+callbacks that only run when /metrics is scraped.
+"""
+import asyncio, bisect
+
+METRICS_PORT = 8767
+# Seconds; covers sub-millisecond stages up to multi-second transcriptions
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    """Label value escaped as the text format requires: backslash, quote, newline."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(label, value):
+    return f'{{{label}="{_escape(value)}"}}' if label else ""
+
+class Histogram:
+    """Fixed-bucket histogram, optionally split by one label (e.g. stage)."""
+
+    def __init__(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+
+    def observe(self, value, label_value=None):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def summary(self, label_value=None):
+        """(count, mean) for one series; handy for log lines."""
+        series = self._series.get(label_value)
+        if not series or not series[-1]:
+            return 0, 0.0
+        return series[-1], series[-2] / series[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, series in sorted(self._series.items(), key=lambda it: str(it[0])):
+            prefix = f'{self.label}="{_escape(value)}",' if self.label else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{_labels(self.label, value)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.label, value)} {series[-1]}")
+        return lines
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        h = Histogram(name, help, label, buckets)
+        self._metrics.append(h)
+        return h
+
+    def gauge(self, name, help, fn, label=None):
+        """fn() returns a number, or a {label value: number} dict when label is given."""
+        self._metrics.append(("gauge", name, help, fn, label))
+
+    def counter(self, name, help, fn, label=None):
+        self._metrics.append(("counter", name, help, fn, label))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            if isinstance(metric, Histogram):
+                lines.extend(metric.render())
+                continue
+            kind, name, help, fn, label = metric
+            try:
+                value = fn()
+            except Exception as e:
+                lines.append(f"# {name} unavailable: {e}")
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if label:
+                for k, v in sorted(value.items(), key=lambda it: str(it[0])):
+                    lines.append(f"{name}{_labels(label, k)} {v}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+async def serve_metrics(registry, host="0.0.0.0", port=METRICS_PORT):
+    """Minimal HTTP server answering GET /metrics on the node's event loop."""
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass  # skip headers
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, ctype, body = "200 OK", "text/plain; version=0.0.4", registry.render().encode("utf-8")
+            else:
+                status, ctype, body = "404 Not Found", "text/plain", b"try /metrics\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Metrics on http://{host}:{port}/metrics")
+    return server
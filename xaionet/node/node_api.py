@@ -1,6 +1,10 @@
 # node/node_api.py
 from flask import Flask, request, jsonify
 import sqlite3, os, time
+from overrides import notify_override, NOTIFY_HOST, NOTIFY_PORT
+from db_writer import init_db as init_node_db
+import log_queries
+from retention import query_archive, ARCHIVE_DIR
 
 app = Flask(__name__)
 
@@ -9,17 +13,12 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DB_PATH = os.path.join(PROJECT_ROOT, "db", "xaionet.db")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-# Function to ensure the database table exists on initialization
+# Nodes to push override changes to (see overrides.py); one entry per node_ws process.
+NODE_NOTIFY_ADDRS = [(NOTIFY_HOST, NOTIFY_PORT)]
+
+# Function to ensure the tables (and the logs indexes the queries rely on) exist on initialization
 def init_db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    c = conn.cursor()
-    c.execute("""CREATE TABLE IF NOT EXISTS overrides(
-        session_id TEXT PRIMARY KEY, 
-        priority INTEGER, 
-        ts REAL
-    )""")
-    conn.commit()
-    conn.close()
+    init_node_db(DB_PATH)
 
 # Run database initialization once on script start
 init_db()
@@ -32,7 +31,10 @@ def get_conn():
 # FIX 1: Add a simple root route to prevent 404s when a browser hits the base URL
 @app.route("/", methods=["GET"], endpoint="root_check")
 def root():
-    return jsonify({"service": "XAIONET Node API", "status": "running", "endpoints": ["/status (GET)", "/override (POST)"]}), 200
+    return jsonify({"service": "XAIONET Node API", "status": "running",
+                    "endpoints": ["/status (GET)", "/override (POST)", "/logs (GET)", "/stats/sessions (GET)",
+                                  "/stats/latency (GET)", "/stats/distribution (GET)", "/stats/rollups (GET)",
+                                  "/archive/logs (GET)", "/search (GET)"]}), 200
 
 # Added explicit endpoint name for robustness
 @app.route("/override", methods=["POST"], endpoint="override_priority")
@@ -51,7 +53,10 @@ def override():
         cur.execute("INSERT OR REPLACE INTO overrides(session_id,priority,ts) VALUES (?,?,?)", (session_id, priority, time.time()))
         conn.commit()
         conn.close()
-        
+
+        # Push to the nodes so the change applies to the very next chunk
+        notify_override(session_id, priority, NODE_NOTIFY_ADDRS)
+
         return jsonify({"ok": True, "session_id": session_id, "priority": priority})
         
     except Exception as e:
@@ -72,6 +77,79 @@ def status():
     except Exception as e:
         return jsonify({"ok": False, "error": f"Database Error: {str(e)}"}), 500
 
+# ================== Log Queries ==================
+def _num(name, cast=float):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a number")
+
+def _filters():
+    """session_id / since / until (unix seconds) from the query string."""
+    return {"session_id": request.args.get("session_id") or None, "since": _num("since"), "until": _num("until")}
+
+def _query(fn, *args, **kwargs):
+    conn = get_conn()
+    try:
+        return jsonify(fn(conn, *args, **kwargs))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"Database Error: {str(e)}"}), 500
+    finally:
+        conn.close()
+
+@app.route("/logs", methods=["GET"], endpoint="list_logs")
+def list_logs():
+    """Newest first. Pass next_cursor back as ?cursor= for the following page."""
+    def page(conn):
+        rows, next_cursor = log_queries.list_logs(
+            conn, **_filters(), priority=_num("priority", int), min_priority=_num("min_priority", int),
+            limit=_num("limit", int) or log_queries.DEFAULT_PAGE_SIZE, cursor=request.args.get("cursor"))
+        return {"rows": rows, "next_cursor": next_cursor}
+    return _query(page)
+
+@app.route("/search", methods=["GET"], endpoint="search_logs")
+def search_logs():
+    """Transcript search: ?q=fire&since=...&order=rank|recent; pass next_cursor back as ?cursor=."""
+    def page(conn):
+        rows, next_cursor = log_queries.search_logs(
+            conn, request.args.get("q", ""), **_filters(), min_priority=_num("min_priority", int),
+            order=request.args.get("order", "rank"), limit=_num("limit", int) or log_queries.DEFAULT_PAGE_SIZE,
+            cursor=request.args.get("cursor"))
+        return {"rows": rows, "next_cursor": next_cursor}
+    return _query(page)
+
+@app.route("/stats/sessions", methods=["GET"], endpoint="session_stats")
+def session_stats():
+    return _query(lambda conn: log_queries.session_counts(
+        conn, since=_num("since"), until=_num("until"), min_priority=_num("min_priority", int),
+        limit=_num("limit", int) or log_queries.DEFAULT_PAGE_SIZE))
+
+@app.route("/stats/latency", methods=["GET"], endpoint="latency_stats")
+def latency_stats():
+    return _query(lambda conn: log_queries.latency_percentiles(
+        conn, metric=request.args.get("metric", "capture_to_forward"), bucket=_num("bucket"), **_filters()))
+
+@app.route("/stats/distribution", methods=["GET"], endpoint="distribution_stats")
+def distribution_stats():
+    return _query(lambda conn: log_queries.distributions(conn, bucket=_num("bucket") or 60, **_filters()))
+
+@app.route("/stats/rollups", methods=["GET"], endpoint="rollup_stats")
+def rollup_stats():
+    """Per-minute rollups (coarser with ?bucket=); covers history already moved to the archive."""
+    return _query(lambda conn: log_queries.rollup_series(conn, bucket=_num("bucket") or 60, **_filters()))
+
+@app.route("/archive/logs", methods=["GET"], endpoint="archive_logs")
+def archive_logs():
+    """Raw rows from the compressed archive, newest first. Slower than /logs; narrow the time range."""
+    return _query(lambda conn: {"rows": query_archive(
+        conn, ARCHIVE_DIR, limit=min(_num("limit", int) or log_queries.DEFAULT_PAGE_SIZE, log_queries.MAX_PAGE_SIZE),
+        **_filters())})
+
 if __name__ == "__main__":
     print("Starting node API on http://0.0.0.0:8000")
     # CRITICAL: debug=True is active to help diagnose future errors
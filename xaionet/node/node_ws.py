@@ -243,140 +243,179 @@ if __name__ == "__main__":
     finally:
         executor.shutdown(wait=True)
 '''
-import asyncio, websockets, json, tempfile, time, os, sqlite3, requests
-from concurrent.futures import ProcessPoolExecutor
-from textblob import TextBlob
-import whisper
-import torch 
+import argparse, asyncio, websockets, json, socket, time, os, sys
+from collections import Counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.audio_utils import WHISPER_SR
+from utils.wire_protocol import is_framed, unpack_chunk, decode_payload, ENC_WAV
+from utils.vad import trim_silence
+from worker_pool import TranscriptionPool
+from asr_engines import ENGINES
+from analysis import AnalysisStage, BACKENDS, RULES_PATH
+from batching import TranscriptionBatcher
+from session_queue import SessionQueue, POLICIES
+from scheduler import SessionPriorities, PrioritySlots
+from db_writer import LogWriter, init_db
+from overrides import listen_for_overrides, watch_overrides
+from dashboard_push import DashboardPusher
+from fanout import FanOut, parse_filters
+from metrics import Registry, serve_metrics, METRICS_PORT
+from telemetry import ResourceSampler, BandwidthMeter, TELEMETRY_INTERVAL_SECS
 
 # ================== Configuration ==================
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DB_PATH = os.path.join(PROJECT_ROOT, "db", "xaionet.db")
+WS_PORT = 8765
 DASHBOARD_UPDATE_URL = "http://localhost:5000/update"
+DASHBOARD_PUSH_HZ = 4.0       # batched pushes per second over one keep-alive connection
+DASHBOARD_BUFFER_SIZE = 500   # updates kept (newest first) while the dashboard is down
 MODEL_NAME = "small"
-PRIORITY_KEYWORDS = {"help","emergency","urgent","accident","fire","hospital"}
-
-# Executor setup
-executor = ProcessPoolExecutor(max_workers=2)
+# ASR backend: "whisper" (PyTorch), "faster-whisper" (CTranslate2, int8 on CPU) or "stub" (no model)
+ENGINE = "whisper"
+FASTER_WHISPER_COMPUTE_TYPE = "int8"
+STUB_DECODE_RTF = 0.0  # simulated compute seconds per audio second for the stub engine
+
+# Worker pool setup: each worker keeps its own resident copy of the model.
+# Keep at 2 workers on a 4GB GPU to avoid CUDA out-of-memory.
+NUM_WORKERS = 2
+pool = None  # TranscriptionPool, created in main()
+
+# Micro-batching: chunks arriving within BATCH_WINDOW_MS (up to MAX_BATCH_SIZE)
+# share one forward pass. Raise the window for throughput, lower it for latency.
+BATCH_WINDOW_MS = 50
+MAX_BATCH_SIZE = 8
+batcher = None  # TranscriptionBatcher, created in main()
+
+# Sentiment + keyword priority, batched on a background thread.
+# Priority keywords live in PRIORITY_RULES_PATH and are reloaded on change.
+SENTIMENT_BACKEND = "textblob"   # or "vader"
+PRIORITY_RULES_PATH = RULES_PATH
+analysis = None  # AnalysisStage, created in main()
+
+# Voice-activity pre-filter: silent chunks are dropped and the rest trimmed to
+# the speech span before they reach Whisper. Backend "energy" (NumPy) or "webrtc".
+VAD_ENABLED = True
+VAD_BACKEND = "energy"
+
+# Backpressure: each sender session has a bounded, ordered queue and at most
+# MAX_IN_FLIGHT chunks are processed node-wide. OVERLOAD_POLICY decides what
+# happens when a session queue is full: "drop_oldest", "reject" or "pause".
+SESSION_QUEUE_SIZE = 4
+MAX_IN_FLIGHT = 16
+OVERLOAD_POLICY = "drop_oldest"
+STATS_INTERVAL_SECS = 30
+# Resend dedupe state survives disconnects (a reconnecting sender resends unacked
+# chunks), so it is capped instead: the least recently used streams go first.
+MAX_TRACKED_STREAMS = 10000
+
+# Priority scheduling: in-flight slots and batch places go to the most urgent
+# sessions first (override, else recent chunk priority), with aging so routine
+# sessions still progress. RESERVED_HIGH_SLOTS are kept for priority >= 8.
+# Operator overrides are held in memory and pushed by node_api.py over UDP.
+RESERVED_HIGH_SLOTS = 2
+OVERRIDE_NOTIFY_PORT = 8766
+in_flight = None  # PrioritySlots(MAX_IN_FLIGHT), created in main()
+
+# Metrics: scrape http://<node>:METRICS_PORT/metrics (0 disables the endpoint).
+# Per-stage timings are always histogrammed; PERSIST_STAGE_TIMINGS also stores
+# them as JSON in logs.stages for every forwarded chunk.
+PERSIST_STAGE_TIMINGS = False
+metrics = Registry()
+stage_seconds = metrics.histogram("xaionet_stage_seconds",
+                                  "Per-chunk seconds in each stage: queue, decode, batch_wait, asr, "
+                                  "transcribe, analysis, forward, total.", label="stage")
+capture_to_forward = metrics.histogram("xaionet_capture_to_forward_seconds",
+                                       "Sender capture time to node forward time (includes network).")
+
+# Telemetry: every TELEMETRY_INTERVAL_SECS the node samples its own and its
+# workers' CPU/RSS plus audio-vs-semantic byte counts and pushes the snapshot
+# to the dashboard (also in the stats reply and on /metrics).
+NODE_NAME = f"{socket.gethostname()}:{WS_PORT}"
+resources = ResourceSampler()
+bandwidth = BandwidthMeter()
+telemetry = {}  # latest snapshot, see report_telemetry()
 
 # ================== Setup Database ==================
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-c = conn.cursor()
-c.execute("""CREATE TABLE IF NOT EXISTS logs(
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    session_id TEXT,
-    capture_ts REAL,
-    transcribe_ts REAL,
-    forward_ts REAL,
-    audio_bytes INTEGER,
-    text_bytes INTEGER,
-    text TEXT,
-    sentiment REAL,
-    priority INTEGER
-)""")
-c.execute("""CREATE TABLE IF NOT EXISTS overrides(
-    session_id TEXT PRIMARY KEY,
-    priority INTEGER,
-    ts REAL
-)""")
-conn.commit()
-conn.close()
+# init_db(DB_PATH) runs at the start of main(), after --db is applied
+log_writer = None  # LogWriter, created in main(); owns the only write connection
+dashboard = None   # DashboardPusher, created in main()
 
 # ================== Globals ==================
 senders = set()
-receivers = set()
+receivers = FanOut()  # per-receiver bounded queues and writer tasks
 pending_headers = {}
+last_seq = {}  # (session_id, stream_id) -> highest seq accepted, to drop resent chunks
+unfinished = {}  # (session_id, stream_id) -> seqs accepted but not yet processed or dropped
+stream_sockets = {}  # (session_id, stream_id) -> sender ws currently connected for that stream
+session_queues = {}  # sender ws -> SessionQueue
+session_priorities = SessionPriorities()
+stage_counters = Counter()  # per-stage decisions, e.g. vad_dropped / vad_trimmed / vad_passed
 
-def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-# Module-level function for safe posting to dashboard (Fixes "Can't pickle" error)
-def post_to_dashboard_safe(payload):
-    """Sends transcription payload to the dashboard API."""
-    import requests
-    try:
-        requests.post(DASHBOARD_UPDATE_URL, json=payload, timeout=0.5)
-    except Exception:
-        pass
-
-# Module-level function for process-safe transcription (Fixes Whisper crash)
-def blocking_transcribe_audio(audio_file, model_name):
-    """Loads the model locally in a new process and performs transcription."""
-    import whisper
-    import torch 
-    
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Loading Whisper model on device: {device}")
-    
+# ================== Processing ==================
+async def process_chunk(header, audio_bytes):
+    session_id = header.get("session_id")
+    started = time.time()
+    recv_ts = header.get("recv_ts", started)
+    timings = {"queue": started - recv_ts}  # seconds per stage, see stage_seconds
+    # Decode in-process to float32 @ 16kHz; workers read it from shared memory
     try:
-        local_model = whisper.load_model(model_name, device=device)
-        
-        # --- FINAL FIXES FOR ACCURACY, REPETITION, AND SILENCE OUTPUT ---
-        initial_prompt = "No Transcribed text"
-        
-        options = {
-            "without_timestamps": True,
-            "initial_prompt": initial_prompt,
-            # Keeping logprob_threshold and temperature for quality, but removing complex result handling
-            "logprob_threshold": -1.0, 
-            "temperature": 0.0, 
-            "suppress_tokens": "-1" 
-        }
-        
-        result = local_model.transcribe(audio_file, **options)
-        
-        # SIMPLIFIED RETURN: Only return text. Confidence filtering moves to the receiver.
-        return {"text": result.get("text", "").strip()}
-
+        samples = decode_payload(audio_bytes, header.get("encoding", ENC_WAV),
+                                 header.get("sample_rate", WHISPER_SR))
     except Exception as e:
-        print(f"Whisper transcription failed in worker process: {e}")
-        return {"text": ""}
+        print("Audio decode error:", e)
+        stage_counters["decode_errors"] += 1
+        return
 
-# ================== Processing ==================
-async def process_chunk(header, audio_bytes):
-    tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-    tmp.write(audio_bytes)
-    tmp.flush()
-    tmp.close()
+    if VAD_ENABLED:
+        stage_counters["vad_in"] += 1
+        speech = trim_silence(samples, WHISPER_SR, backend=VAD_BACKEND)
+        if speech is None:
+            stage_counters["vad_dropped"] += 1
+            print(f"INFO: VAD dropped silent chunk from {session_id} "
+                  f"({stage_counters['vad_dropped']}/{stage_counters['vad_in']} dropped so far).")
+            return
+        if len(speech) < len(samples):
+            stage_counters["vad_trimmed"] += 1
+            stage_counters["vad_trimmed_samples"] += len(samples) - len(speech)
+        else:
+            stage_counters["vad_passed"] += 1
+        samples = speech
+    decoded = time.time()
+    timings["decode"] = decoded - started
 
-    loop = asyncio.get_running_loop()
     text = ""
     try:
-        # Use the process-safe transcription function
-        result = await loop.run_in_executor(executor, blocking_transcribe_audio, tmp.name, MODEL_NAME)
+        # Batched with other sessions' chunks on a worker with the model loaded
+        result = await batcher.transcribe(samples, priority=session_priorities.get(session_id))
         text = result.get("text", "").strip()
+        timings["batch_wait"] = result.get("batch_wait_secs", 0.0)
+        timings["asr"] = result.get("compute_secs", 0.0)
     except Exception as e:
         print("Transcription error:", e)
         text = ""
     trans_end = time.time()
+    timings["transcribe"] = trans_end - decoded
 
     # --- SERVER-SIDE SILENCE & GARBAGE FILTER ---
     MIN_SPEECH_LENGTH = 5
     if not text or len(text) < MIN_SPEECH_LENGTH:
+        stage_counters["no_speech"] += 1
         print("INFO: No meaningful speech detected. Dropping this chunk.")
-        try:
-            os.remove(tmp.name)
-        except Exception:
-            pass
         return
     # --------------------------------------------
 
-    polarity = TextBlob(text).sentiment.polarity
-    sentiment = "positive" if polarity > 0.1 else "negative" if polarity < -0.1 else "neutral"
-    session_id = header.get("session_id")
-
-    conn_r = get_conn()
-    c_r = conn_r.cursor()
-    c_r.execute("SELECT priority FROM overrides WHERE session_id=?", (session_id,))
-    r = c_r.fetchone()
-    conn_r.close()
+    result = await analysis.analyze(text)
+    polarity = result["polarity"]
+    sentiment = result["sentiment"]
+    analysed = time.time()
+    timings["analysis"] = analysed - trans_end
 
-    if r:
-        priority = int(r[0])
+    override = session_priorities.overrides.get(session_id)
+    if override is not None:
+        priority = override
     else:
-        low = text.lower()
-        priority = 10 if any(k in low for k in PRIORITY_KEYWORDS) else (7 if polarity < -0.6 else 1)
+        priority = result["priority"]
+        session_priorities.observe(session_id, priority)
 
     payload = {
         "session_id": session_id,
@@ -391,48 +430,135 @@ async def process_chunk(header, audio_bytes):
         "text_bytes": len(text.encode("utf-8"))
     }
 
-    # Insert to DB
-    conn_w = get_conn()
-    c_w = conn_w.cursor()
-    try:
-        c_w.execute("""INSERT INTO logs(session_id,capture_ts,transcribe_ts,forward_ts,audio_bytes,text_bytes,text,sentiment,priority)
-                     VALUES (?,?,?,?,?,?,?,?,?)""",
-                   (session_id, header.get("capture_ts"), trans_end, payload["forward_ts"],
-                    payload["audio_bytes"], payload["text_bytes"], text, polarity, priority))
-        conn_w.commit()
-    except Exception as e:
-        print("DB insertion error:", e)
-    finally:
-        conn_w.close()
-
-    # Forward to Dashboard
-    await loop.run_in_executor(executor, post_to_dashboard_safe, payload)
+    # Forward to Dashboard (buffered; never takes a transcription worker)
+    dashboard.publish(payload)
+
+    # Broadcast to receivers (serialized once, queued to each matching subscriber)
+    delivered, semantic_bytes = receivers.publish(payload)
+    bandwidth.record_result(session_id, payload["text_bytes"], semantic_bytes, delivered)
+
+    done = time.time()
+    timings["forward"] = done - analysed
+    timings["total"] = done - recv_ts
+    for stage, secs in timings.items():
+        stage_seconds.observe(secs, stage)
+    if payload["capture_ts"]:
+        capture_to_forward.observe(payload["forward_ts"] - payload["capture_ts"])
+    stages = None
+    if PERSIST_STAGE_TIMINGS:
+        stages = json.dumps({k: round(1000 * v, 2) for k, v in timings.items()})
+
+    # Insert to DB (queued; the writer thread commits in batches)
+    log_writer.write((session_id, header.get("capture_ts"), trans_end, payload["forward_ts"],
+                      payload["audio_bytes"], payload["text_bytes"], text, polarity, priority, stages))
+
+def queue_stats():
+    """Snapshot of queue depth and overload counters across all sender sessions."""
+    depths = {q.session_id: q.depth() for q in session_queues.values()}
+    return {
+        "sessions": len(depths),
+        "queue_depth_total": sum(depths.values()),
+        "queue_depth_max": max(depths.values(), default=0),
+        "queue_depths": depths,
+        "in_flight": sum(q.busy for q in session_queues.values()),
+        "waiting_for_slot": in_flight.waiting() if in_flight else 0,
+        "batch_pending": batcher.depth() if batcher else 0,
+        "dropped": stage_counters["queue_dropped"] + sum(q.dropped for q in session_queues.values()),
+        "rejected": stage_counters["queue_rejected"] + sum(q.rejected for q in session_queues.values())
+    }
 
-    # Broadcast to receivers
-    msg = json.dumps({"type": "semantic", "payload": payload})
-    websockets_to_remove = []
-    send_tasks = []
-    for r in list(receivers):
-        async def safe_send(ws, message):
-            try:
-                await ws.send(message)
-            except Exception:
-                websockets_to_remove.append(ws)
-        send_tasks.append(safe_send(r, msg))
-    await asyncio.gather(*send_tasks)
-    for r in websockets_to_remove:
-        receivers.discard(r)
+async def report_stats():
+    while True:
+        await asyncio.sleep(STATS_INTERVAL_SECS)
+        q = queue_stats()
+        r = receivers.stats()
+        print(f"Stats: {q['sessions']} sessions, queue depth {q['queue_depth_total']} (max {q['queue_depth_max']}), "
+              f"in-flight {q['in_flight']}/{MAX_IN_FLIGHT} ({q['waiting_for_slot']} waiting), "
+              f"dropped {q['dropped']}, rejected {q['rejected']}, duplicates {stage_counters['duplicates']}; "
+              f"{r['receivers']} receivers, lag max {r['lag_max']}, receiver drops {r['dropped']}; "
+              f"ASR {pool.engine} RTF {batcher.rtf():.2f}")
+        if telemetry:
+            res, bw = telemetry["resources"], telemetry["bandwidth"]
+            print(f"Resources: CPU {res['cpu_total']:.0f}% of a core ({res['cpu_machine']:.0f}% of "
+                  f"{res['cpu_count']}), RSS {res['rss_mb_total']:.0f} MB across {1 + len(res['workers'])} processes; "
+                  f"audio {bw['total']['audio'] / 2 ** 20:.1f} MB -> semantic {bw['total']['semantic'] / 2 ** 10:.1f} KB "
+                  f"(x{bw['total']['ratio'] or 0}), wire in {bw['wire']['in_bps'] / 1000:.1f} kB/s, "
+                  f"out {bw['wire']['out_bps'] / 1000:.1f} kB/s")
+        a = analysis.timings()
+        print(f"Analysis: {analysis.stats['texts']} texts in {analysis.stats['batches']} batches, "
+              f"avg wait {a['wait_ms']:.1f}ms, sentiment {a['sentiment_ms']:.2f}ms, rules {a['rules_ms']:.3f}ms")
+
+async def report_telemetry():
+    """Samples resources and bandwidth on a fixed interval and streams them to the dashboard."""
+    global telemetry
+    while True:
+        await asyncio.sleep(TELEMETRY_INTERVAL_SECS)
+        telemetry = {"type": "telemetry", "node": NODE_NAME, "ts": time.time(),
+                     "resources": resources.sample(list(pool.ready_workers)),
+                     "bandwidth": bandwidth.snapshot()}
+        dashboard.publish(telemetry)
 
-    # Clean up temp file
+# ================== WebSocket Handler ==================
+def is_duplicate(header, stream_id):
+    """True if this chunk was already accepted (a sender resending its spool after reconnecting)."""
+    seq = header.get("seq")
+    if seq is None:
+        return False  # senders without sequence numbers cannot be deduplicated
+    key = (header.get("session_id"), stream_id)
+    last = last_seq.pop(key, -1)  # re-inserted below, which marks it most recently used
+    if seq <= last:
+        last_seq[key] = last
+        return True
+    last_seq[key] = seq
+    if len(last_seq) > MAX_TRACKED_STREAMS:
+        del last_seq[next(iter(last_seq))]
+    return False
+
+def accept_chunk(header, stream_id):
+    if header.get("seq") is not None:
+        unfinished.setdefault((header.get("session_id"), stream_id), set()).add(header["seq"])
+
+async def ack_chunk(ws, header, outcome="processed"):
+    """
+    Tells the sender it may delete this one chunk from its spool: "ack" once it
+    is processed, "dropped" if an overload policy discarded it. Acks are per
+    chunk, never cumulative, so a finished chunk cannot release earlier ones
+    that are still queued or being processed.
+    """
+    if header.get("seq") is None:
+        return
     try:
-        os.remove(tmp.name)
+        await ws.send(json.dumps({"type": "ack" if outcome == "processed" else "dropped",
+                                  "session_id": header.get("session_id"), "seq": header["seq"]}))
     except Exception:
         pass
 
-# ================== WebSocket Handler ==================
+async def finish_chunk(header, session_id, stream_id, outcome):
+    """SessionQueue on_done: the chunk is settled; report it on the stream's current connection."""
+    key = (header.get("session_id"), stream_id)
+    seqs = unfinished.get(key)
+    if seqs is not None:
+        seqs.discard(header.get("seq"))
+        if not seqs:
+            del unfinished[key]
+    ws = stream_sockets.get((session_id, stream_id))
+    if ws is not None:
+        await ack_chunk(ws, header, outcome)
+
+async def subscribe_receiver(ws, msg):
+    """Applies a receiver's filters, or tells it what was wrong and leaves the socket open."""
+    try:
+        sessions, min_priority = parse_filters(msg)
+    except ValueError as e:
+        await ws.send(json.dumps({"type": "error", "error": str(e), "ts": time.time()}))
+        return False
+    receivers.subscribe(ws, sessions, min_priority)
+    return True
+
 async def handler(ws):
     session_id = None
     role = "unknown"
+    squeue = None
     try:
         reg = await ws.recv()
         regobj = json.loads(reg)
@@ -442,18 +568,33 @@ async def handler(ws):
 
         role = regobj.get("role")
         session_id = regobj.get("session_id")
+        stream_id = regobj.get("stream_id")
 
         if role == "sender":
             senders.add(ws)
+            squeue = SessionQueue(session_id, ws, process_chunk, in_flight,
+                                  maxsize=SESSION_QUEUE_SIZE, policy=OVERLOAD_POLICY,
+                                  priority=lambda: session_priorities.get(session_id),
+                                  on_done=lambda header, outcome: finish_chunk(header, session_id, stream_id, outcome))
+            session_queues[ws] = squeue
+            squeue.start()
+            # Chunks still settling from a previous connection of this stream report here
+            stream_sockets[(session_id, stream_id)] = ws
             print("Sender connected:", session_id)
+        elif role == "monitor":
+            pass  # only asks for stats snapshots
         elif role == "receiver":
-            receivers.add(ws)
-            print("Receiver connected")
+            # Optional filters: "sessions": [...] and "min_priority": n
+            if await subscribe_receiver(ws, regobj):
+                print(f"Receiver connected (sessions={regobj.get('sessions') or 'all'}, "
+                      f"min_priority={regobj.get('min_priority', 0)})")
         else:
             await ws.close()
             return
 
         async for message in ws:
+            if squeue is not None:
+                bandwidth.record_in(session_id, len(message))
             if isinstance(message, str):
                 try:
                     obj = json.loads(message)
@@ -461,29 +602,200 @@ async def handler(ws):
                         if "session_id" not in obj:
                             obj["session_id"] = session_id
                         pending_headers[ws] = obj
+                    elif obj.get("type") == "subscribe" and role == "receiver":
+                        await subscribe_receiver(ws, obj)
+                    elif obj.get("type") == "stats":
+                        await ws.send(json.dumps({"type": "stats", "ts": time.time(), "queues": queue_stats(),
+                                                  "receivers": receivers.stats(), "stages": dict(stage_counters),
+                                                  "telemetry": telemetry}))
                 except Exception:
                     continue
             else:
-                header = pending_headers.pop(ws, {"session_id": session_id, "capture_ts": time.time()})
-                asyncio.create_task(process_chunk(header, message))
+                if squeue is None:
+                    continue  # only senders may stream audio
+                if is_framed(message):
+                    # Binary protocol: header and audio in one frame
+                    try:
+                        header, payload = unpack_chunk(message)
+                    except ValueError as e:
+                        stage_counters["bad_frames"] += 1
+                        print(f"Bad audio frame from session {session_id}: {e}")
+                        continue
+                    header["session_id"] = header["session_id"] or session_id
+                    audio = payload
+                else:
+                    # Legacy protocol: JSON audio_chunk header, then a WAV frame
+                    header = pending_headers.pop(ws, {"session_id": session_id, "capture_ts": time.time()})
+                    audio = message
+                if is_duplicate(header, stream_id):
+                    stage_counters["duplicates"] += 1
+                    # Still queued from an earlier connection: acked when it finishes
+                    if header.get("seq") not in unfinished.get((header.get("session_id"), stream_id), ()):
+                        await ack_chunk(ws, header)
+                    continue
+                accept_chunk(header, stream_id)
+                header["recv_ts"] = time.time()
+                bandwidth.record_audio(session_id, len(audio))
+                await squeue.put(header, audio)
     except websockets.exceptions.ConnectionClosed:
         pass
     except Exception as e:
         print(f"Handler error for session {session_id} ({role}): {e}")
     finally:
         senders.discard(ws)
-        receivers.discard(ws)
+        receivers.unsubscribe(ws)
         pending_headers.pop(ws, None)
+        if squeue is not None:
+            if stream_sockets.get((session_id, stream_id)) is ws:
+                del stream_sockets[(session_id, stream_id)]
+            await squeue.close()
+            session_queues.pop(ws, None)
+            stage_counters["queue_dropped"] += squeue.dropped
+            stage_counters["queue_rejected"] += squeue.rejected
+            session_priorities.forget(session_id)
+            bandwidth.forget(session_id)
+
+def register_metrics():
+    """Gauges and counters read from live objects only when /metrics is scraped."""
+    metrics.gauge("xaionet_sessions", "Connected sender sessions.", lambda: len(session_queues))
+    metrics.gauge("xaionet_queue_depth", "Chunks queued per session.",
+                  lambda: {q.session_id: q.depth() for q in session_queues.values()}, label="session")
+    metrics.gauge("xaionet_in_flight", "Chunks being processed.", lambda: sum(q.busy for q in session_queues.values()))
+    metrics.gauge("xaionet_in_flight_limit", "Max chunks processed at once.", lambda: MAX_IN_FLIGHT)
+    metrics.gauge("xaionet_waiting_for_slot", "Chunks waiting for an in-flight slot.", lambda: in_flight.waiting())
+    metrics.gauge("xaionet_batch_pending", "Chunks waiting to join a transcription batch.", batcher.depth)
+    metrics.gauge("xaionet_analysis_pending", "Transcripts waiting for analysis.", analysis.depth)
+    metrics.gauge("xaionet_workers", "Transcription worker processes.", lambda: pool.max_workers)
+    metrics.gauge("xaionet_workers_busy", "Workers currently running a batch.", lambda: batcher.running)
+    metrics.counter("xaionet_worker_busy_seconds_total",
+                    "Summed batch time; rate() / xaionet_workers is worker utilisation.", lambda: batcher.busy_secs)
+    metrics.gauge("xaionet_worker_load_seconds", "Model load time per worker.",
+                  lambda: {pid: w["load_secs"] for pid, w in pool.ready_workers.items()}, label="pid")
+    metrics.counter("xaionet_worker_restarts_total", "Worker pool restarts after a crash.", lambda: pool.restarts)
+    metrics.gauge("xaionet_asr_rtf", "Engine compute seconds per audio second.", batcher.rtf)
+    metrics.counter("xaionet_chunks_dropped_total", "Chunks discarded, by reason.", lambda: {
+        "queue_full": queue_stats()["dropped"],
+        "rejected": queue_stats()["rejected"],
+        "vad_silent": stage_counters["vad_dropped"],
+        "no_speech": stage_counters["no_speech"],
+        "decode_error": stage_counters["decode_errors"],
+        "bad_frame": stage_counters["bad_frames"],
+        "duplicate": stage_counters["duplicates"]
+    }, label="reason")
+    metrics.gauge("xaionet_receivers", "Connected receivers.", lambda: len(receivers))
+    metrics.gauge("xaionet_receiver_lag", "Messages queued for receivers (total and worst).",
+                  lambda: {k: receivers.stats()[f"lag_{k}"] for k in ("total", "max")}, label="agg")
+    metrics.counter("xaionet_receiver_dropped_total", "Messages dropped for slow receivers.",
+                    lambda: receivers.stats()["dropped"])
+    metrics.gauge("xaionet_db_pending_rows", "Log rows waiting for the writer thread.", log_writer.pending)
+    metrics.counter("xaionet_db_rows_total", "Log rows committed.", lambda: log_writer.rows_written)
+    metrics.counter("xaionet_db_flush_seconds_total", "Time spent committing log batches.", lambda: log_writer.flush_secs)
+    metrics.gauge("xaionet_dashboard_pending", "Updates buffered for the dashboard.", dashboard.pending)
+    metrics.gauge("xaionet_process_cpu_percent", "CPU per process, percent of one core (node and workers).",
+                  lambda: _per_process("cpu"), label="process")
+    metrics.gauge("xaionet_process_rss_megabytes", "Resident memory per process.",
+                  lambda: _per_process("rss_mb"), label="process")
+    metrics.counter("xaionet_bytes_total", "Bytes by kind: wire_in from senders, audio accepted, "
+                    "semantic forwarded, out written to receivers.",
+                    lambda: {k: bandwidth.total[k] for k in ("wire_in", "audio", "text", "semantic")} |
+                            {"out": bandwidth.out_bytes}, label="kind")
+
+def _per_process(field):
+    res = telemetry.get("resources") or {}
+    out = {"node": res["node"][field]} if res.get("node") else {}
+    out.update({f"worker-{pid}": w[field] for pid, w in res.get("workers", {}).items()})
+    return out
 
 # ================== Main ==================
-async def main():
-    async with websockets.serve(handler, "0.0.0.0", 8765, max_size=None):
-        print("WebSocket server running on ws://0.0.0.0:8765")
+def engine_options(engine):
+    if engine == "faster-whisper":
+        return {"compute_type": FASTER_WHISPER_COMPUTE_TYPE}
+    if engine == "stub":
+        return {"decode_rtf": STUB_DECODE_RTF}
+    return {}
+
+async def main(model_name=MODEL_NAME, num_workers=NUM_WORKERS,
+               batch_window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE, engine=ENGINE):
+    global pool, batcher, analysis, in_flight, log_writer, dashboard
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    init_db(DB_PATH)
+    log_writer = LogWriter(DB_PATH).start()
+    dashboard = DashboardPusher(DASHBOARD_UPDATE_URL, push_hz=DASHBOARD_PUSH_HZ,
+                                buffer_size=DASHBOARD_BUFFER_SIZE).start()
+    if VAD_ENABLED:
+        print(f"VAD pre-filter enabled (backend: {VAD_BACKEND})")
+    pool = TranscriptionPool(model_name, max_workers=num_workers, engine=engine,
+                             engine_options=engine_options(engine))
+    await pool.start()
+    batcher = TranscriptionBatcher(pool, window_ms=batch_window_ms, max_batch_size=max_batch_size)
+    batcher.start()
+    analysis = await AnalysisStage(SENTIMENT_BACKEND, PRIORITY_RULES_PATH).start()
+    in_flight = PrioritySlots(MAX_IN_FLIGHT, reserved_high=RESERVED_HIGH_SLOTS)
+    await listen_for_overrides(session_priorities, port=OVERRIDE_NOTIFY_PORT)
+    asyncio.create_task(watch_overrides(session_priorities, DB_PATH))
+    asyncio.create_task(report_stats())
+    asyncio.create_task(report_telemetry())
+    register_metrics()
+    if METRICS_PORT:
+        await serve_metrics(metrics, port=METRICS_PORT)
+    async with websockets.serve(handler, "0.0.0.0", WS_PORT, max_size=None):
+        print(f"WebSocket server running on ws://0.0.0.0:{WS_PORT}")
         await asyncio.Future()  # run forever
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XAIONET node WebSocket server.")
+    parser.add_argument("--port", type=int, default=WS_PORT, help="WebSocket port for senders and receivers.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database for the logs table.")
+    parser.add_argument("--override-port", type=int, default=OVERRIDE_NOTIFY_PORT, help="UDP port for override notifications.")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="HTTP port for /metrics (0 = off).")
+    parser.add_argument("--persist-stage-timings", action="store_true", help="Store per-stage timings in logs.stages.")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL_SECS, help="Seconds between stats lines.")
+    parser.add_argument("--model", default=MODEL_NAME, help="Whisper model name loaded by each worker.")
+    parser.add_argument("--engine", choices=list(ENGINES), default=ENGINE, help="ASR backend run by the workers.")
+    parser.add_argument("--compute-type", default=FASTER_WHISPER_COMPUTE_TYPE, help="faster-whisper quantization, e.g. int8, int8_float32, float32.")
+    parser.add_argument("--sentiment", choices=BACKENDS, default=SENTIMENT_BACKEND, help="Sentiment analyser.")
+    parser.add_argument("--priority-rules", default=PRIORITY_RULES_PATH, help="JSON keyword/phrase priority rules (reloaded on change).")
+    parser.add_argument("--stub-rtf", type=float, default=STUB_DECODE_RTF, help="Simulated real-time factor for the stub engine.")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Number of transcription worker processes.")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS, help="How long to wait for more chunks before decoding a batch.")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE, help="Maximum chunks per batched decode.")
+    parser.add_argument("--no-vad", action="store_true", help="Disable the voice-activity pre-filter.")
+    parser.add_argument("--vad-backend", choices=["energy", "webrtc"], default=VAD_BACKEND, help="VAD implementation (webrtc needs the webrtcvad package).")
+    parser.add_argument("--queue-size", type=int, default=SESSION_QUEUE_SIZE, help="Max queued chunks per sender session.")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT, help="Max chunks processed at once across all sessions.")
+    parser.add_argument("--overload-policy", choices=POLICIES, default=OVERLOAD_POLICY, help="What to do when a session queue is full.")
+    parser.add_argument("--dashboard-hz", type=float, default=DASHBOARD_PUSH_HZ, help="Dashboard push rate (batches per second).")
+    parser.add_argument("--telemetry-interval", type=float, default=TELEMETRY_INTERVAL_SECS, help="Seconds between resource/bandwidth snapshots.")
+    parser.add_argument("--reserved-high-slots", type=int, default=RESERVED_HIGH_SLOTS, help="In-flight slots reserved for high-priority sessions.")
+    args = parser.parse_args()
+    WS_PORT = args.port
+    DB_PATH = args.db
+    OVERRIDE_NOTIFY_PORT = args.override_port
+    STATS_INTERVAL_SECS = args.stats_interval
+    METRICS_PORT = args.metrics_port
+    PERSIST_STAGE_TIMINGS = args.persist_stage_timings
+    VAD_ENABLED = not args.no_vad
+    VAD_BACKEND = args.vad_backend
+    SESSION_QUEUE_SIZE = args.queue_size
+    MAX_IN_FLIGHT = args.max_in_flight
+    OVERLOAD_POLICY = args.overload_policy
+    RESERVED_HIGH_SLOTS = args.reserved_high_slots
+    DASHBOARD_PUSH_HZ = args.dashboard_hz
+    TELEMETRY_INTERVAL_SECS = args.telemetry_interval
+    NODE_NAME = f"{socket.gethostname()}:{WS_PORT}"
+    FASTER_WHISPER_COMPUTE_TYPE = args.compute_type
+    STUB_DECODE_RTF = args.stub_rtf
+    SENTIMENT_BACKEND = args.sentiment
+    PRIORITY_RULES_PATH = args.priority_rules
+
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.model, args.workers, args.batch_window_ms, args.max_batch, args.engine))
     except KeyboardInterrupt:
         print("\nServer shutting down.")
     finally:
-        executor.shutdown(wait=True)
+        if dashboard is not None:
+            dashboard.close()
+        if log_writer is not None:
+            log_writer.close()
+            print(f"Log writer flushed: {log_writer.rows_written} rows in {log_writer.batches_written} batches.")
+        if pool is not None:
+            pool.shutdown(wait=True)
@@ -0,0 +1,84 @@
+# node/overrides.py
+"""
+In-memory operator overrides with push notification.
+
+node_api.py writes an override to the database and then sends a small UDP
+datagram to every node; the node updates its in-memory copy as soon as the
+datagram arrives. As a safety net for lost datagrams or overrides written by
+other tools, a watcher reads the one-row override_version counter (bumped by
+triggers on the overrides table, see db_writer.py) and reloads the table only
+when it changes; log writes never trigger a reload.
+"""
+import asyncio, json, socket, sqlite3, time
+
+NOTIFY_HOST = "127.0.0.1"
+NOTIFY_PORT = 8766
+WATCH_INTERVAL_SECS = 2.0
+
+# ================== API Side ==================
+def notify_override(session_id, priority, addrs=((NOTIFY_HOST, NOTIFY_PORT),)):
+    """Fire-and-forget push of one override change to the given node addresses."""
+    msg = json.dumps({"type": "override", "session_id": session_id,
+                      "priority": priority, "ts": time.time()}).encode("utf-8")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for addr in addrs:
+            try:
+                sock.sendto(msg, addr)
+            except OSError as e:
+                print(f"Override notify to {addr} failed: {e}")
+    finally:
+        sock.close()
+
+# ================== Node Side ==================
+def load_overrides(db_path):
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    try:
+        return {sid: int(p) for sid, p in conn.execute("SELECT session_id, priority FROM overrides")}
+    finally:
+        conn.close()
+
+class OverrideListener(asyncio.DatagramProtocol):
+    """Applies pushed override datagrams to a SessionPriorities instance."""
+
+    def __init__(self, priorities):
+        self.priorities = priorities
+
+    def datagram_received(self, data, addr):
+        try:
+            msg = json.loads(data)
+            if msg.get("type") != "override" or not msg.get("session_id"):
+                return
+            if msg.get("priority") is None:
+                self.priorities.clear_override(msg["session_id"])
+            else:
+                self.priorities.set_override(msg["session_id"], int(msg["priority"]))
+            print(f"Override applied: {msg['session_id']} -> {msg.get('priority')}")
+        except Exception as e:
+            print(f"Bad override notification from {addr}: {e}")
+
+async def listen_for_overrides(priorities, host=NOTIFY_HOST, port=NOTIFY_PORT):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: OverrideListener(priorities), local_addr=(host, port))
+    print(f"Listening for override notifications on udp://{host}:{port}")
+    return transport
+
+async def watch_overrides(priorities, db_path, interval=WATCH_INTERVAL_SECS):
+    """Reloads overrides whenever the trigger-maintained override_version changes."""
+    loop = asyncio.get_running_loop()
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    last_version = None
+    try:
+        while True:
+            try:
+                version = await loop.run_in_executor(
+                    None, lambda: conn.execute("SELECT version FROM override_version WHERE id = 1").fetchone()[0])
+                if version != last_version:
+                    priorities.set_overrides(await loop.run_in_executor(None, load_overrides, db_path))
+                    last_version = version
+            except Exception as e:
+                print("Override reload error:", e)
+            await asyncio.sleep(interval)
+    finally:
+        conn.close()
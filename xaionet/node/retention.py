@@ -0,0 +1,227 @@
+# node/retention.py
+"""
+Tiered retention for the logs table.
+
+Runs as its own process next to the node (it never touches the node's event
+loop or writer thread) and works in small, short transactions so the node's
+LogWriter is never blocked for long:
+
+  1. Rollup: every new log row (tracked by an id watermark, so late rows
+     resent from a sender's spool are still counted) is added into
+     log_rollups, one row per session per minute.
+  2. Archive: raw rows older than RAW_RETENTION_DAYS, once rolled up, are
+     written to gzip-compressed columnar JSON files under ARCHIVE_DIR, listed
+     in archive_files, and deleted from logs in the same transaction that
+     records the file.
+  3. Reclaim: freed pages are returned to the OS a few at a time with
+     incremental_vacuum (new databases are created with auto_vacuum=INCREMENTAL;
+     run once with --convert to switch an existing one, which needs a VACUUM).
+
+Archived rows stay queryable through query_archive() (/archive/logs in
+node_api.py); the manifest lets it open only files overlapping the requested
+time range and session.
+
+    python retention.py                  # loop every INTERVAL_SECS
+    python retention.py --once --raw-days 3
+"""
+import argparse, gzip, json, os, sqlite3, time
+from db_writer import init_db, connect
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DB_PATH = os.path.join(PROJECT_ROOT, "db", "xaionet.db")
+ARCHIVE_DIR = os.path.join(PROJECT_ROOT, "db", "archive")
+
+RAW_RETENTION_DAYS = 7
+INTERVAL_SECS = 300
+ROLLUP_BATCH_ROWS = 20000    # rows aggregated per transaction
+ARCHIVE_BATCH_ROWS = 5000    # rows per archive file / delete transaction
+RECLAIM_PAGES = 2000         # pages freed per incremental_vacuum step
+FTS_MERGE_PAGES = 500        # logs_fts segment pages merged per pass
+PAUSE_SECS = 0.05            # gap between transactions so the node's writer gets the lock
+HIGH_PRIORITY = 8
+
+ARCHIVE_FIELDS = ("id", "session_id", "capture_ts", "transcribe_ts", "forward_ts",
+                  "audio_bytes", "text_bytes", "text", "sentiment", "priority", "stages")
+
+ROLLUP_SQL = f"""
+INSERT INTO log_rollups
+SELECT session_id, CAST(capture_ts / 60 AS INTEGER) * 60, COUNT(*),
+       SUM(audio_bytes), SUM(text_bytes), SUM(priority), MAX(priority),
+       SUM(priority >= {HIGH_PRIORITY}), SUM(sentiment),
+       SUM(sentiment > 0.1), SUM(sentiment BETWEEN -0.1 AND 0.1), SUM(sentiment < -0.1),
+       SUM(forward_ts - capture_ts), MAX(forward_ts - capture_ts)
+FROM logs WHERE id > ? AND id <= ? AND capture_ts IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT(session_id, minute_ts) DO UPDATE SET
+    chunks = chunks + excluded.chunks,
+    audio_bytes = audio_bytes + excluded.audio_bytes,
+    text_bytes = text_bytes + excluded.text_bytes,
+    priority_sum = priority_sum + excluded.priority_sum,
+    priority_max = MAX(priority_max, excluded.priority_max),
+    high_priority = high_priority + excluded.high_priority,
+    polarity_sum = polarity_sum + excluded.polarity_sum,
+    positive = positive + excluded.positive,
+    neutral = neutral + excluded.neutral,
+    negative = negative + excluded.negative,
+    latency_sum = latency_sum + excluded.latency_sum,
+    latency_max = MAX(latency_max, excluded.latency_max)
+"""
+
+def _state(conn, key, default=0):
+    row = conn.execute("SELECT value FROM retention_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def _set_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO retention_state(key, value) VALUES (?, ?)", (key, value))
+
+# ================== Rollup ==================
+def rollup(conn, batch_rows=ROLLUP_BATCH_ROWS):
+    """Adds every log row past the watermark into log_rollups. Returns rows rolled up."""
+    last_id = int(_state(conn, "rollup_id"))
+    max_id = conn.execute("SELECT MAX(id) FROM logs").fetchone()[0] or 0
+    done = 0
+    while last_id < max_id:
+        upto = min(last_id + batch_rows, max_id)
+        with conn:
+            n = conn.execute("SELECT COUNT(*) FROM logs WHERE id > ? AND id <= ?", (last_id, upto)).fetchone()[0]
+            conn.execute(ROLLUP_SQL, (last_id, upto))
+            _set_state(conn, "rollup_id", upto)
+        done += n
+        last_id = upto
+        time.sleep(PAUSE_SECS)
+    return done
+
+# ================== Archive ==================
+def _write_archive(archive_dir, rows):
+    """Writes rows as one gzip'd columnar JSON file. Returns (path, bytes)."""
+    columns = {f: [r[i] for r in rows] for i, f in enumerate(ARCHIVE_FIELDS)}
+    first, last = rows[0], rows[-1]
+    day = time.strftime("%Y%m%d", time.gmtime(first[2]))
+    path = os.path.join(archive_dir, day, f"logs-{int(first[2])}-{first[0]}-{last[0]}.json.gz")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump({"format": 1, "fields": ARCHIVE_FIELDS, "columns": columns}, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path, os.path.getsize(path)
+
+def archive(conn, archive_dir=ARCHIVE_DIR, raw_days=RAW_RETENTION_DAYS, batch_rows=ARCHIVE_BATCH_ROWS):
+    """Moves rolled-up rows older than raw_days into archive files. Returns (rows, files)."""
+    cutoff = time.time() - raw_days * 86400
+    rolled_up = int(_state(conn, "rollup_id"))
+    moved = files = 0
+    while True:
+        rows = conn.execute(f"SELECT {','.join(ARCHIVE_FIELDS)} FROM logs WHERE capture_ts < ? AND id <= ? "
+                            f"ORDER BY capture_ts, id LIMIT ?", (cutoff, rolled_up, batch_rows)).fetchall()
+        if not rows:
+            return moved, files
+        path, size = _write_archive(archive_dir, rows)
+        ids = [r[0] for r in rows]
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO archive_files VALUES (?,?,?,?,?,?,?,?,?)",
+                         (os.path.relpath(path, archive_dir), rows[0][2], max(r[2] for r in rows),
+                          min(ids), max(ids), len(rows), size, json.dumps(sorted({r[1] for r in rows})),
+                          time.time()))
+            conn.executemany("DELETE FROM logs WHERE id = ?", [(i,) for i in ids])
+        moved += len(rows)
+        files += 1
+        reclaim(conn)
+        time.sleep(PAUSE_SECS)
+
+def remove_orphans(conn, archive_dir=ARCHIVE_DIR):
+    """Deletes archive files a crash left behind before their rows were removed from logs."""
+    known = {p for (p,) in conn.execute("SELECT path FROM archive_files")}
+    removed = 0
+    for root, _, names in os.walk(archive_dir):
+        for name in names:
+            rel = os.path.relpath(os.path.join(root, name), archive_dir)
+            if rel not in known:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+# ================== Reclaim ==================
+def reclaim(conn, pages=RECLAIM_PAGES):
+    """Frees up to pages unused pages (no-op unless auto_vacuum=INCREMENTAL)."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if free:
+        # executescript steps the pragma to completion; execute() frees only one page
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+    return min(free, pages)
+
+def convert_to_incremental(db_path):
+    """One-off: enables incremental vacuum on an existing database (full VACUUM; stop the node first)."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    conn.close()
+
+# ================== Archive Queries ==================
+def query_archive(conn, archive_dir=ARCHIVE_DIR, session_id=None, since=None, until=None, limit=100):
+    """Archived rows matching the filters, newest first, reading only overlapping files."""
+    sql = "SELECT path, sessions, max_ts FROM archive_files WHERE 1=1"
+    params = []
+    if since is not None:
+        sql += " AND max_ts >= ?"
+        params.append(since)
+    if until is not None:
+        sql += " AND min_ts < ?"
+        params.append(until)
+    out = []
+    for path, sessions, max_ts in conn.execute(sql + " ORDER BY max_ts DESC", params).fetchall():
+        # Files come newest first; stop once no remaining file can hold a row newer than the page
+        if len(out) >= limit and max_ts < out[limit - 1]["capture_ts"]:
+            break
+        if session_id is not None and session_id not in json.loads(sessions):
+            continue
+        with gzip.open(os.path.join(archive_dir, path), "rt", encoding="utf-8") as f:
+            doc = json.load(f)
+        cols = doc["columns"]
+        for i in range(len(cols["id"])):
+            ts = cols["capture_ts"][i]
+            if ((session_id is None or cols["session_id"][i] == session_id)
+                    and (since is None or ts >= since) and (until is None or ts < until)):
+                out.append({f: cols[f][i] for f in doc["fields"]})
+        out.sort(key=lambda r: (r["capture_ts"], r["id"]), reverse=True)
+        del out[limit:]
+    return out
+
+# ================== Runner ==================
+def run_once(db_path=DB_PATH, archive_dir=ARCHIVE_DIR, raw_days=RAW_RETENTION_DAYS):
+    conn = connect(db_path)
+    try:
+        started = time.time()
+        orphans = remove_orphans(conn, archive_dir)
+        rolled = rollup(conn)
+        moved, files = archive(conn, archive_dir, raw_days)
+        freed = reclaim(conn)
+        # Keep the search index's segment count low between the node's small inserts
+        with conn:
+            conn.execute("INSERT INTO logs_fts(logs_fts, rank) VALUES ('merge', ?)", (FTS_MERGE_PAGES,))
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        print(f"Retention: rolled up {rolled} rows, archived {moved} rows into {files} files, "
+              f"freed {freed} pages, removed {orphans} orphan files in {time.time() - started:.1f}s")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll up, archive and reclaim old XAIONET log rows.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--raw-days", type=float, default=RAW_RETENTION_DAYS, help="Keep raw rows in the database this long.")
+    parser.add_argument("--interval", type=float, default=INTERVAL_SECS, help="Seconds between runs.")
+    parser.add_argument("--once", action="store_true", help="Run one pass and exit.")
+    parser.add_argument("--convert", action="store_true", help="Enable incremental vacuum on an existing database (full VACUUM; stop the node first).")
+    args = parser.parse_args()
+
+    init_db(args.db)
+    if args.convert:
+        convert_to_incremental(args.db)
+        print("Database converted to auto_vacuum=INCREMENTAL.")
+    while True:
+        run_once(args.db, args.archive_dir, args.raw_days)
+        if args.once:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,296 @@
+# node/router.py
+"""
+Session router in front of several node_ws.py instances.
+
+Senders and receivers connect to the router exactly as they would to a node.
+Each sender session is pinned to one node by a consistent-hash ring, and its
+frames (and the node's acks) are relayed unchanged. The router keeps one
+receiver link to every node, subscribed to all sessions, and republishes the
+semantic results through its own FanOut so receivers keep their session and
+priority filters.
+
+When a node's link drops, the node leaves the ring and the router closes the
+sender connections pinned to it; senders reconnect (resending their spool)
+and hash to the remaining nodes. Only the departed node's sessions move. The
+link keeps retrying and the node rejoins the ring when it is reachable again.
+
+    python router.py --nodes ws://127.0.0.1:8771 ws://127.0.0.1:8772 --port 8765
+"""
+import argparse, asyncio, bisect, hashlib, json, time
+import websockets
+from fanout import FanOut, parse_filters
+
+ROUTER_PORT = 8765
+NODES = ["ws://127.0.0.1:8771", "ws://127.0.0.1:8772"]
+VIRTUAL_NODES = 64          # ring points per node; more points = more even spread
+LINK_RETRY_SECS = 2.0
+STATS_TIMEOUT_SECS = 2.0
+STATS_INTERVAL_SECS = 30
+
+# ================== Consistent Hashing ==================
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+class HashRing:
+
+    def __init__(self, nodes=(), vnodes=VIRTUAL_NODES):
+        self.vnodes = vnodes
+        self._keys = []    # sorted ring positions
+        self._owner = {}   # position -> node
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(set(self._owner.values()))
+
+    def __contains__(self, node):
+        return node in self._owner.values()
+
+    def add(self, node):
+        for i in range(self.vnodes):
+            key = _hash(f"{node}#{i}")
+            if key not in self._owner:
+                bisect.insort(self._keys, key)
+                self._owner[key] = node
+
+    def remove(self, node):
+        for i in range(self.vnodes):
+            key = _hash(f"{node}#{i}")
+            if self._owner.get(key) == node:
+                del self._owner[key]
+                self._keys.pop(bisect.bisect_left(self._keys, key))
+
+    def lookup(self, session_id):
+        """Node owning this session, or None if the ring is empty."""
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(session_id)) % len(self._keys)
+        return self._owner[self._keys[i]]
+
+# ================== Node Links ==================
+class NodeLink:
+    """Receiver-role connection to one node: liveness, semantic results and stats."""
+
+    def __init__(self, uri, router):
+        self.uri = uri
+        self.router = router
+        self.ws = None
+        self.relayed = 0
+        self._stats_waiters = []
+
+    async def run(self):
+        while True:
+            try:
+                async with websockets.connect(self.uri, max_size=None) as ws:
+                    await ws.send(json.dumps({"type": "register", "role": "receiver", "session_id": "router"}))
+                    self.ws = ws
+                    self.router.node_up(self.uri)
+                    async for msg in ws:
+                        try:
+                            obj = json.loads(msg)
+                        except json.JSONDecodeError:
+                            continue
+                        # Malformed frames are skipped rather than ending the link
+                        if not isinstance(obj, dict):
+                            continue
+                        if obj.get("type") == "semantic":
+                            if not isinstance(obj.get("payload"), dict):
+                                continue
+                            self.relayed += 1
+                            self.router.receivers.publish(obj["payload"])
+                        elif obj.get("type") == "stats" and self._stats_waiters:
+                            fut = self._stats_waiters.pop(0)
+                            if not fut.done():
+                                fut.set_result(obj)
+            except (OSError, websockets.exceptions.WebSocketException):
+                pass
+            except Exception as e:
+                # Anything else still goes through the reconnect path below
+                print(f"Link to {self.uri} failed: {e}")
+            self.ws = None
+            for fut in self._stats_waiters:
+                fut.cancel()
+            self._stats_waiters.clear()
+            self.router.node_down(self.uri)
+            await asyncio.sleep(LINK_RETRY_SECS)
+
+    async def stats(self):
+        if self.ws is None:
+            return None
+        fut = asyncio.get_running_loop().create_future()
+        self._stats_waiters.append(fut)
+        try:
+            await self.ws.send(json.dumps({"type": "stats"}))
+            return await asyncio.wait_for(fut, STATS_TIMEOUT_SECS)
+        except (asyncio.TimeoutError, asyncio.CancelledError, websockets.exceptions.WebSocketException):
+            return None
+
+def merge_stats(snapshots):
+    """Adds up per-node stats snapshots; *_max fields take the maximum."""
+    queues, stages = {}, {}
+    for snap in snapshots:
+        for k, v in snap.get("queues", {}).items():
+            if isinstance(v, dict):
+                queues.setdefault(k, {}).update(v)
+            elif k.endswith("_max"):
+                queues[k] = max(queues.get(k, 0), v)
+            else:
+                queues[k] = queues.get(k, 0) + v
+        for k, v in snap.get("stages", {}).items():
+            stages[k] = stages.get(k, 0) + v
+    return queues, stages
+
+# ================== Router ==================
+class Router:
+
+    def __init__(self, nodes, vnodes=VIRTUAL_NODES):
+        self.ring = HashRing(vnodes=vnodes)
+        self.links = {uri: NodeLink(uri, self) for uri in nodes}
+        self.receivers = FanOut()
+        self.pinned = {uri: set() for uri in nodes}  # node -> sender connections routed to it
+        self.moved = 0
+
+    def start(self):
+        for link in self.links.values():
+            asyncio.create_task(link.run())
+
+    def node_up(self, uri):
+        if uri not in self.ring:
+            self.ring.add(uri)
+            print(f"Node {uri} joined; {len(self.ring)}/{len(self.links)} nodes in ring.")
+
+    def node_down(self, uri):
+        if uri in self.ring:
+            self.ring.remove(uri)
+            print(f"Node {uri} left; {len(self.ring)}/{len(self.links)} nodes in ring, "
+                  f"moving {len(self.pinned[uri])} sessions.")
+        # Senders reconnect and hash to a live node
+        for ws in list(self.pinned[uri]):
+            self.moved += 1
+            asyncio.create_task(ws.close(1012, "node left; reconnect"))
+
+    async def stats(self):
+        snaps = [s for s in await asyncio.gather(*(link.stats() for link in self.links.values())) if s]
+        queues, stages = merge_stats(snaps)
+        return {"type": "stats", "ts": time.time(), "queues": queues, "stages": stages,
+                "receivers": self.receivers.stats(),
+                "nodes": {uri: {"up": uri in self.ring, "sessions": len(self.pinned[uri]),
+                                "relayed": self.links[uri].relayed} for uri in self.links}}
+
+    async def route_sender(self, ws, register_msg, session_id):
+        node = self.ring.lookup(session_id or "")
+        if node is None:
+            await ws.close(1013, "no nodes available")
+            return
+        try:
+            upstream = await websockets.connect(node, max_size=None)
+        except (OSError, websockets.exceptions.WebSocketException):
+            # The node's link decides whether it left the ring; the sender just retries
+            await ws.close(1013, "node unavailable; reconnect")
+            return
+        self.pinned[node].add(ws)
+        print(f"Sender {session_id} -> {node}")
+
+        async def relay(src, dst):
+            try:
+                async for msg in src:
+                    await dst.send(msg)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+        tasks = []
+        try:
+            await upstream.send(register_msg)
+            tasks = [asyncio.create_task(relay(ws, upstream)), asyncio.create_task(relay(upstream, ws))]
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        except websockets.exceptions.WebSocketException:
+            pass
+        finally:
+            for t in tasks:
+                t.cancel()
+            # Collect both outcomes so a failed relay is logged, not left "never retrieved"
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    print(f"Relay for sender {session_id} failed: {result!r}")
+            self.pinned[node].discard(ws)
+            await upstream.close()
+            await ws.close(1012, "node connection closed")
+
+    async def subscribe_receiver(self, ws, msg):
+        """Same filter validation as node_ws: bad filters get an error reply, not a closed socket."""
+        try:
+            sessions, min_priority = parse_filters(msg)
+        except ValueError as e:
+            await ws.send(json.dumps({"type": "error", "error": str(e), "ts": time.time()}))
+            return False
+        self.receivers.subscribe(ws, sessions, min_priority)
+        return True
+
+    async def handler(self, ws):
+        role = "unknown"
+        try:
+            reg = await ws.recv()
+            regobj = json.loads(reg)
+            if regobj.get("type") != "register":
+                await ws.close()
+                return
+            role = regobj.get("role")
+            if role == "sender":
+                await self.route_sender(ws, reg, regobj.get("session_id"))
+                return
+            if role == "receiver":
+                if await self.subscribe_receiver(ws, regobj):
+                    print(f"Receiver connected (sessions={regobj.get('sessions') or 'all'}, "
+                          f"min_priority={regobj.get('min_priority', 0)})")
+            elif role != "monitor":
+                await ws.close()
+                return
+            async for message in ws:
+                try:
+                    obj = json.loads(message)
+                except Exception:
+                    continue
+                if not isinstance(obj, dict):
+                    continue
+                if obj.get("type") == "subscribe" and role == "receiver":
+                    await self.subscribe_receiver(ws, obj)
+                elif obj.get("type") == "stats":
+                    await ws.send(json.dumps(await self.stats()))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            print(f"Router handler error ({role}): {e}")
+        finally:
+            self.receivers.unsubscribe(ws)
+
+    async def report_stats(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL_SECS)
+            r = self.receivers.stats()
+            nodes = ", ".join(f"{uri} {'up' if uri in self.ring else 'DOWN'} "
+                              f"({len(self.pinned[uri])} sessions, {self.links[uri].relayed} relayed)"
+                              for uri in self.links)
+            print(f"Router: {nodes}; {r['receivers']} receivers, lag max {r['lag_max']}, "
+                  f"receiver drops {r['dropped']}, {self.moved} sessions moved")
+
+async def main(nodes, port=ROUTER_PORT, vnodes=VIRTUAL_NODES):
+    router = Router(nodes, vnodes)
+    router.start()
+    asyncio.create_task(router.report_stats())
+    async with websockets.serve(router.handler, "0.0.0.0", port, max_size=None):
+        print(f"Router running on ws://0.0.0.0:{port} for {len(nodes)} nodes")
+        await asyncio.Future()  # run forever
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Route XAIONET sessions across several nodes.")
+    parser.add_argument("--nodes", nargs="+", default=NODES, help="ws:// URIs of the node_ws.py instances.")
+    parser.add_argument("--port", type=int, default=ROUTER_PORT, help="Port senders and receivers connect to.")
+    parser.add_argument("--vnodes", type=int, default=VIRTUAL_NODES, help="Hash ring points per node.")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL_SECS, help="Seconds between stats lines.")
+    args = parser.parse_args()
+    STATS_INTERVAL_SECS = args.stats_interval
+
+    try:
+        asyncio.run(main(args.nodes, args.port, args.vnodes))
+    except KeyboardInterrupt:
+        print("\nRouter shutting down.")
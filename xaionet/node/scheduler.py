@@ -0,0 +1,121 @@
+# node/scheduler.py
+"""
+Priority-aware scheduling in front of the transcription pool.
+
+SessionPriorities knows each session's current priority before its next chunk
+is transcribed: an operator override if there is one, otherwise the highest
+priority among the session's recent chunks. PrioritySlots is the node-wide
+in-flight limit, granting free slots to the most urgent waiter first.
+"""
+import asyncio, itertools, time
+from collections import deque
+
+HIGH_PRIORITY = 8          # same "HIGH" cut-off the dashboard uses
+AGING_PER_SEC = 1.0        # waiting chunks gain one priority level per second
+PRIORITY_HISTORY_LEN = 3   # recent chunks that count towards a session's priority
+
+def effective_priority(priority, queued_at, now):
+    """Priority plus aging, so low-priority work cannot starve."""
+    return priority + AGING_PER_SEC * (now - queued_at)
+
+class SessionPriorities:
+    """Per-session priority from operator overrides and recent history."""
+
+    def __init__(self, history_len=PRIORITY_HISTORY_LEN, default=1):
+        self.default = default
+        self.overrides = {}
+        self._history = {}
+        self._history_len = history_len
+
+    def set_overrides(self, overrides):
+        self.overrides = dict(overrides)
+
+    def set_override(self, session_id, priority):
+        self.overrides[session_id] = priority
+
+    def clear_override(self, session_id):
+        self.overrides.pop(session_id, None)
+
+    def observe(self, session_id, priority):
+        """Records the content-derived priority of a session's latest chunk."""
+        hist = self._history.get(session_id)
+        if hist is None:
+            hist = self._history[session_id] = deque(maxlen=self._history_len)
+        hist.append(priority)
+
+    def forget(self, session_id):
+        self._history.pop(session_id, None)
+
+    def get(self, session_id):
+        if session_id in self.overrides:
+            return self.overrides[session_id]
+        hist = self._history.get(session_id)
+        return max(hist) if hist else self.default
+
+class PrioritySlots:
+    """
+    Counting semaphore that grants slots by effective priority rather than FIFO.
+    reserved_high slots can only be taken by priority >= HIGH_PRIORITY, which
+    guarantees urgent sessions capacity even when routine traffic fills the node.
+    """
+
+    def __init__(self, limit, reserved_high=1):
+        self.limit = limit
+        self.reserved_high = min(reserved_high, max(limit - 1, 0))
+        self.in_use = 0
+        self._waiters = []  # (priority, queued_at, seq, future)
+        self._seq = itertools.count()
+
+    def _can_grant(self, priority):
+        free = self.limit - self.in_use
+        if priority >= HIGH_PRIORITY:
+            return free > 0
+        return free > self.reserved_high
+
+    def waiting(self):
+        return len(self._waiters)
+
+    async def acquire(self, priority):
+        fut = asyncio.get_running_loop().create_future()
+        waiter = (priority, time.time(), next(self._seq), fut)
+        self._waiters.append(waiter)
+        self._wake()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif fut.done() and not fut.cancelled():
+                self.release()  # slot was granted just as we were cancelled
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self):
+        now = time.time()
+        self._waiters = [w for w in self._waiters if not w[3].done()]
+        while self._waiters:
+            # Base priority decides eligibility for reserved slots; aging decides order.
+            eligible = [w for w in self._waiters if self._can_grant(w[0])]
+            if not eligible:
+                return
+            best = max(eligible, key=lambda w: (effective_priority(w[0], w[1], now), -w[2]))
+            self._waiters.remove(best)
+            self.in_use += 1
+            best[3].set_result(None)
+
+    def slot(self, priority):
+        return _Slot(self, priority)
+
+class _Slot:
+    def __init__(self, slots, priority):
+        self._slots = slots
+        self._priority = priority
+
+    async def __aenter__(self):
+        await self._slots.acquire(self._priority)
+
+    async def __aexit__(self, *exc):
+        self._slots.release()
@@ -0,0 +1,107 @@
+# node/session_queue.py
+"""
+Bounded, ordered per-session chunk queues.
+
+Each sender connection gets one SessionQueue with its own consumer task, so a
+session's chunks are processed one at a time and in arrival order. A shared
+PrioritySlots limiter caps how many chunks are being processed node-wide and
+lets the most urgent sessions in first. The optional on_done(header, outcome)
+callback runs once per chunk when it is finished with, outcome being
+"processed", "dropped" or "rejected", so the node can acknowledge or report it
+to the sender.
+"""
+import asyncio, json, time
+
+POLICIES = ("drop_oldest", "reject", "pause")
+
+class SessionQueue:
+    """
+    Overload policies when the queue is full:
+      drop_oldest - discard the oldest queued chunk to make room (lowest latency)
+      reject      - discard the new chunk and tell the sender with an "overload" message
+      pause       - stop reading the socket until there is room, so TCP backpressure
+                    reaches the sender
+    """
+
+    def __init__(self, session_id, ws, process, in_flight, maxsize=4, policy="drop_oldest", priority=None,
+                 on_done=None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overload policy '{policy}'")
+        self.session_id = session_id
+        self.ws = ws
+        self.policy = policy
+        self.dropped = 0
+        self.rejected = 0
+        self.processed = 0
+        self.busy = False  # True while one of this session's chunks is being processed
+        self._process = process
+        self._in_flight = in_flight
+        self._priority = priority or (lambda: 1)
+        self._on_done = on_done
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def start(self):
+        self._task = asyncio.create_task(self._consume())
+
+    async def _done(self, header, outcome):
+        if self._on_done is not None:
+            await self._on_done(header, outcome)
+
+    async def put(self, header, audio_bytes):
+        item = (header, audio_bytes)
+        if self.policy == "pause":
+            await self._queue.put(item)
+            return True
+        if self._queue.full():
+            if self.policy == "drop_oldest":
+                old_header, _ = self._queue.get_nowait()
+                self._queue.task_done()
+                self.dropped += 1
+                print(f"WARN: session {self.session_id} queue full; dropped oldest chunk ({self.dropped} so far).")
+                await self._done(old_header, "dropped")
+            else:
+                self.rejected += 1
+                try:
+                    await self.ws.send(json.dumps({
+                        "type": "overload",
+                        "session_id": self.session_id,
+                        "capture_ts": header.get("capture_ts"),
+                        "reason": "session queue full",
+                        "ts": time.time()
+                    }))
+                except Exception:
+                    pass
+                await self._done(header, "rejected")
+                return False
+        self._queue.put_nowait(item)
+        return True
+
+    async def _consume(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                if item is None:
+                    return
+                async with self._in_flight.slot(self._priority()):
+                    self.busy = True
+                    try:
+                        await self._process(*item)
+                    finally:
+                        self.busy = False
+                self.processed += 1
+            except Exception as e:
+                print(f"Chunk processing error for session {self.session_id}: {e}")
+            finally:
+                self._queue.task_done()
+            await self._done(item[0], "processed")
+
+    async def close(self):
+        """Lets already-queued chunks finish, then stops the consumer."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
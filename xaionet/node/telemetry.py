@@ -0,0 +1,134 @@
+# node/telemetry.py
+"""
+Resource and bandwidth telemetry for the node.
+
+ResourceSampler reads CPU time and resident memory for the node process and
+each transcription worker (psutil when installed, else /proc on Linux) and
+turns CPU time into a percentage of one core between samples.
+
+BandwidthMeter counts, per session and overall, what arrives on the wire
+from senders, the audio inside it, and the semantic payloads (text +
+analysis) the node forwards instead. audio_bytes / semantic_bytes is the
+bandwidth the node saves every receiver; in/out rates are wire throughput
+between two snapshots.
+"""
+import os, time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+TELEMETRY_INTERVAL_SECS = 2.0
+MAX_SESSIONS = 50   # per-session entries in a snapshot, largest audio first
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def read_process(pid):
+    """(cpu_seconds, rss_bytes) for pid, or None if it is gone or unreadable."""
+    try:
+        if psutil is not None:
+            p = psutil.Process(pid)
+            t = p.cpu_times()
+            return t.user + t.system, p.memory_info().rss
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        # utime and stime are fields 14 and 15 of stat; fields[0] here is field 3
+        return (int(fields[11]) + int(fields[12])) / _CLK_TCK, rss_pages * _PAGE_SIZE
+    except Exception:
+        return None
+
+class ResourceSampler:
+
+    def __init__(self):
+        self.cpu_count = os.cpu_count() or 1
+        self._last = {}  # pid -> (wall, cpu_seconds)
+
+    def _sample(self, pid, now):
+        reading = read_process(pid)
+        if reading is None:
+            return None
+        cpu_secs, rss = reading
+        prev = self._last.get(pid)
+        self._last[pid] = (now, cpu_secs)
+        # Percent of one core since the previous sample (0 on the first one)
+        cpu = 100.0 * (cpu_secs - prev[1]) / (now - prev[0]) if prev and now > prev[0] else 0.0
+        return {"cpu": round(cpu, 1), "rss_mb": round(rss / 2 ** 20, 1)}
+
+    def sample(self, worker_pids=()):
+        now = time.monotonic()
+        node = self._sample(os.getpid(), now)
+        workers = {}
+        for pid in worker_pids:
+            s = self._sample(pid, now)
+            if s is not None:
+                workers[str(pid)] = s
+        for pid in set(self._last) - {os.getpid()} - set(worker_pids):
+            del self._last[pid]  # restarted or exited workers
+        procs = ([node] if node else []) + list(workers.values())
+        total_cpu = sum(p["cpu"] for p in procs)
+        return {"available": node is not None, "cpu_count": self.cpu_count, "node": node, "workers": workers,
+                "cpu_total": round(total_cpu, 1),
+                # Share of the whole machine, for a 0-100 gauge
+                "cpu_machine": round(total_cpu / self.cpu_count, 1),
+                "rss_mb_total": round(sum(p["rss_mb"] for p in procs), 1)}
+
+def _counts():
+    return {"wire_in": 0, "audio": 0, "chunks": 0, "forwarded": 0, "text": 0, "semantic": 0}
+
+def savings(c):
+    """Audio-vs-semantic numbers for one set of counts."""
+    return {"ratio": round(c["audio"] / c["semantic"], 1) if c["semantic"] else None,
+            "saved_pct": round(100.0 * (1 - c["semantic"] / c["audio"]), 2) if c["audio"] else None}
+
+class BandwidthMeter:
+
+    def __init__(self):
+        self.total = _counts()
+        self.sessions = {}      # session_id -> counts, while the sender is connected
+        self.out_bytes = 0      # semantic bytes written to receivers (payload x deliveries)
+        self._last = None       # (monotonic, wire_in, out_bytes) at the previous snapshot
+
+    def _session(self, session_id):
+        c = self.sessions.get(session_id)
+        if c is None:
+            c = self.sessions[session_id] = _counts()
+        return c
+
+    def record_in(self, session_id, nbytes):
+        """Any frame a sender put on the wire (headers, duplicates and all)."""
+        self.total["wire_in"] += nbytes
+        self._session(session_id)["wire_in"] += nbytes
+
+    def record_audio(self, session_id, nbytes):
+        """Audio payload of a chunk accepted for processing."""
+        for c in (self.total, self._session(session_id)):
+            c["audio"] += nbytes
+            c["chunks"] += 1
+
+    def record_result(self, session_id, text_bytes, semantic, delivered):
+        """A forwarded semantic message (its encoded size) and the number of receivers it went to."""
+        # A result can land after its sender disconnected; don't resurrect the session
+        for c in (self.total, self.sessions.get(session_id, _counts())):
+            c["forwarded"] += 1
+            c["text"] += text_bytes
+            c["semantic"] += semantic
+        self.out_bytes += semantic * delivered
+
+    def forget(self, session_id):
+        self.sessions.pop(session_id, None)
+
+    def snapshot(self):
+        now = time.monotonic()
+        rates = {"in_bps": 0.0, "out_bps": 0.0}
+        if self._last is not None and now > self._last[0]:
+            secs = now - self._last[0]
+            rates = {"in_bps": round((self.total["wire_in"] - self._last[1]) / secs, 1),
+                     "out_bps": round((self.out_bytes - self._last[2]) / secs, 1)}
+        self._last = (now, self.total["wire_in"], self.out_bytes)
+        return {"total": dict(self.total, out=self.out_bytes, **savings(self.total)), "wire": rates,
+                "sessions": {s: dict(c, **savings(c)) for s, c in
+                             sorted(self.sessions.items(), key=lambda it: -it[1]["audio"])[:MAX_SESSIONS]}}
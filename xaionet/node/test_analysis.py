@@ -0,0 +1,12 @@
+# node/test_analysis.py
+from analysis import PriorityRules
+
+def test_rule_whitespace_is_normalised():
+    rules = PriorityRules({"keywords": {"heart  attack": 10, " fire": 9, "Gas\tLeak ": 8}})
+    assert rules.priority("possible HEART\n attack on floor two", 0.0) == (10, ["heart attack"])
+    assert rules.priority("small fire in the kitchen", 0.0) == (9, ["fire"])
+    assert rules.priority("gas leak reported", 0.0) == (8, ["gas leak"])
+
+def test_blank_rule_is_ignored():
+    rules = PriorityRules({"keywords": {"  ": 10, "help": 10}})
+    assert rules.priority("all quiet", 0.0) == (1, [])
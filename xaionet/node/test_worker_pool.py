@@ -0,0 +1,26 @@
+# node/test_worker_pool.py
+import asyncio
+import numpy as np
+from asr_engines import SAMPLE_RATE
+from worker_pool import TranscriptionPool, share_audio, release_audio, transcribe_batch_in_worker
+
+def test_stub_pool_transcribes_through_shared_memory():
+    speech = (np.sin(np.arange(SAMPLE_RATE * 2) * 0.05) * 0.5).astype(np.float32)
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+
+    async def run():
+        pool = TranscriptionPool("small", max_workers=1, engine="stub")
+        await pool.start(ready_timeout=30)
+        blocks = [share_audio(a) for a in (speech, silence, speech)]
+        try:
+            return len(pool.ready_workers), await pool.run(transcribe_batch_in_worker, [ref for _, ref in blocks])
+        finally:
+            for shm, _ in blocks:
+                release_audio(shm)
+            pool.shutdown()
+
+    ready, results = asyncio.run(run())
+    assert ready == 1
+    assert [r["audio_secs"] for r in results] == [2.0, 1.0, 2.0]
+    assert results[0]["text"] and results[0]["text"] == results[2]["text"]  # deterministic
+    assert results[1]["text"] == ""  # silence
@@ -0,0 +1,149 @@
+# node/worker_pool.py
+"""
+Persistent transcription worker pool.
+
+Each ProcessPoolExecutor worker loads its ASR engine (see asr_engines.py) once
+in its initializer and keeps it for every task it runs, instead of loading a
+model per chunk. Decoded audio is handed to workers through shared memory, so
+no temp files or ffmpeg subprocesses are involved.
+"""
+import asyncio, multiprocessing, os, queue, time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+from asr_engines import create_engine, SAMPLE_RATE
+
+# ================== Shared Audio ==================
+def share_audio(samples):
+    """Copies float32 samples into a new shared memory block. Returns (shm, ref)."""
+    shm = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1))
+    view = np.ndarray(samples.shape, dtype=np.float32, buffer=shm.buf)
+    view[:] = samples
+    del view
+    return shm, (shm.name, samples.shape[0])
+
+def release_audio(shm):
+    """Frees a block created by share_audio() once the worker is done with it."""
+    try:
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+# ================== Worker Side ==================
+# Populated once per worker process by _init_worker()
+_engine = None
+
+def _init_worker(engine_name, model_name, engine_options, ready_queue):
+    """Loads the ASR engine into this worker process and reports readiness."""
+    global _engine
+    try:
+        _engine = create_engine(engine_name, model_name, **engine_options).load()
+        ready_queue.put({"pid": os.getpid(), "ok": True, "engine": engine_name,
+                         "device": _engine.device, "load_secs": _engine.load_secs})
+    except Exception as e:
+        print(f"Worker {os.getpid()} failed to load {engine_name} model '{model_name}': {e}")
+        ready_queue.put({"pid": os.getpid(), "ok": False, "error": str(e)})
+        raise
+
+def transcribe_batch_in_worker(audio_refs):
+    """
+    Transcribes several shared-memory audio blocks in one engine call. Each
+    result carries its audio length and its share of the batch compute time,
+    so callers can track the real-time factor.
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name, _ in audio_refs]
+    audios = [np.ndarray((n,), dtype=np.float32, buffer=shm.buf)
+              for shm, (_, n) in zip(blocks, audio_refs)]
+    try:
+        total = sum(n for _, n in audio_refs) or 1
+        try:
+            texts, secs = _engine.transcribe_batch(audios)
+        except Exception as e:
+            print(f"{_engine.name} transcription failed in worker process: {e}")
+            texts, secs = [""] * len(audios), 0.0
+        return [{"text": text, "audio_secs": n / SAMPLE_RATE, "compute_secs": secs * n / total}
+                for text, (_, n) in zip(texts, audio_refs)]
+    finally:
+        del audios
+        for shm in blocks:
+            shm.close()
+
+# ================== Pool ==================
+class TranscriptionPool:
+    """ProcessPoolExecutor wrapper that keeps models resident and survives worker crashes."""
+
+    def __init__(self, model_name, max_workers=2, engine="whisper", engine_options=None):
+        self.model_name = model_name
+        self.engine = engine
+        self.engine_options = engine_options or {}
+        self.max_workers = max_workers
+        self.ready_workers = {}
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context()
+        self._ready_queue = self._ctx.Queue()
+        self._executor = None
+        self._restart_lock = asyncio.Lock()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._ctx,
+                                   initializer=_init_worker,
+                                   initargs=(self.engine, self.model_name, self.engine_options,
+                                             self._ready_queue))
+
+    def _drain_ready(self, timeout):
+        """Blocks until every worker has reported in (or timeout). Runs in a thread."""
+        deadline = time.time() + timeout
+        reported = 0
+        while reported < self.max_workers:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                msg = self._ready_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            reported += 1
+            if msg.get("ok"):
+                self.ready_workers[msg["pid"]] = msg
+                print(f"Worker {msg['pid']} ready: {msg['engine']} '{self.model_name}' on {msg['device']} "
+                      f"(loaded in {msg['load_secs']:.1f}s)")
+        return reported
+
+    async def start(self, ready_timeout=300):
+        """Starts the workers and waits until each has loaded its model."""
+        self._executor = self._new_executor()
+        loop = asyncio.get_running_loop()
+        # Workers only spawn on first submit, so kick each one with a no-op.
+        for _ in range(self.max_workers):
+            self._executor.submit(os.getpid)
+        reported = await loop.run_in_executor(None, self._drain_ready, ready_timeout)
+        print(f"Transcription pool ready: {len(self.ready_workers)}/{self.max_workers} workers "
+              f"({reported} reported)")
+
+    async def _restart(self, broken_executor):
+        async with self._restart_lock:
+            if self._executor is not broken_executor:
+                return  # another task already restarted the pool
+            print("Transcription worker crashed; restarting pool.")
+            broken_executor.shutdown(wait=False, cancel_futures=True)
+            self.ready_workers.clear()
+            self.restarts += 1
+            await self.start()
+
+    async def run(self, fn, *args):
+        """Runs fn(*args) in a worker, restarting the pool and retrying once if a worker died."""
+        loop = asyncio.get_running_loop()
+        for attempt in (1, 2):
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                await self._restart(executor)
+                if attempt == 2:
+                    raise
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
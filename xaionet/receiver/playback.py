@@ -0,0 +1,205 @@
+# receiver/playback.py
+"""
+Priority-preemptive TTS playback for the receiver.
+
+offer() only pushes onto a heap under a lock, so the WebSocket reader never
+waits for audio output. One dedicated thread owns the TTS engine and always
+speaks the most urgent item next (highest priority, then oldest). Text is
+spoken a sentence at a time; when an item arrives whose priority beats the
+one being spoken by PREEMPT_MARGIN, the current utterance is cut off at the
+next word and its unspoken sentences go back in the queue behind it.
+
+Items below STALE_BELOW_PRIORITY that waited longer than STALE_SECS are
+dropped instead of spoken, and when the queue is full the least urgent item
+goes first. stats() reports depth, drops, preemptions and queue lag (time
+from arrival to the start of playback).
+"""
+import heapq, itertools, re, threading, time
+
+MAX_QUEUE = 50
+STALE_SECS = 15.0            # low-priority items older than this are skipped
+STALE_BELOW_PRIORITY = 8     # priority >= this is never dropped as stale
+PREEMPT_MARGIN = 2           # interrupt when new priority >= current + margin
+REQUEUE_INTERRUPTED = True   # speak the rest of an interrupted item later
+HIGH_PRIORITY = 8
+SILENCE_TEXT = "No text received"
+DRY_RUN_WORDS_PER_SEC = 2.5  # speaking speed simulated by DryRunSpeaker
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+def speech_rate(text, priority):
+    """pyttsx3 words-per-minute: urgent messages faster, system messages slower."""
+    if text == SILENCE_TEXT:
+        return 130
+    return 200 if priority >= HIGH_PRIORITY else 150
+
+class Pyttsx3Speaker:
+    """Speaks through pyttsx3; stop() cuts the current utterance off at the next word."""
+
+    def __init__(self):
+        self._engine = None
+        self._interrupt = threading.Event()
+
+    def _init(self):
+        import pyttsx3
+        self._engine = pyttsx3.init()
+        # The engine can only be stopped from inside its own loop, i.e. a callback
+        self._engine.connect("started-word", self._on_word)
+
+    def _on_word(self, name, location, length):
+        if self._interrupt.is_set():
+            self._engine.stop()
+
+    def say(self, text, priority):
+        """Blocks until text is spoken. Returns False if it was interrupted."""
+        if self._engine is None:
+            self._init()
+        self._interrupt.clear()
+        self._engine.setProperty("rate", speech_rate(text, priority))
+        self._engine.say(text)
+        self._engine.runAndWait()
+        return not self._interrupt.is_set()
+
+    def stop(self):
+        self._interrupt.set()
+
+class DryRunSpeaker:
+    """Prints instead of speaking and takes as long as speech would (--no-audio)."""
+
+    def __init__(self, words_per_sec=DRY_RUN_WORDS_PER_SEC):
+        self.words_per_sec = words_per_sec
+        self._interrupt = threading.Event()
+
+    def say(self, text, priority):
+        self._interrupt.clear()
+        print(f"(speaking) {text}")
+        return not self._interrupt.wait(len(text.split()) / self.words_per_sec)
+
+    def stop(self):
+        self._interrupt.set()
+
+class PlaybackQueue:
+
+    def __init__(self, speaker, max_queue=MAX_QUEUE, stale_secs=STALE_SECS,
+                 stale_below=STALE_BELOW_PRIORITY, preempt_margin=PREEMPT_MARGIN):
+        self.speaker = speaker
+        self.max_queue = max_queue
+        self.stale_secs = stale_secs
+        self.stale_below = stale_below
+        self.preempt_margin = preempt_margin
+        self.played = 0
+        self.dropped_stale = 0
+        self.dropped_full = 0
+        self.preempted = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self._lag_sum = 0.0
+        self._heap = []            # (-priority, seq, item)
+        self._seq = itertools.count()
+        self._current = None       # item being spoken
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="tts-playback", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self, timeout=2):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.speaker.stop()
+        self._thread.join(timeout)
+
+    def depth(self):
+        return len(self._heap)
+
+    def offer(self, text, priority=0, session_id=None, capture_ts=None):
+        """Queues text for playback; never blocks on audio. Called from the event loop."""
+        item = {"text": text, "priority": priority, "session_id": session_id,
+                "capture_ts": capture_ts, "arrived": time.time()}
+        with self._cond:
+            self._push(item)
+            if len(self._heap) > self.max_queue:
+                self._drop_least_urgent()
+            current = self._current
+            if current is not None and priority >= current["priority"] + self.preempt_margin:
+                current["preempted"] = True
+                self.speaker.stop()
+            self._cond.notify()
+
+    def _push(self, item):
+        heapq.heappush(self._heap, (-item["priority"], next(self._seq), item))
+
+    def _drop_least_urgent(self):
+        # Lowest priority, newest first among equals (the oldest is closer to playing)
+        victim = max(self._heap, key=lambda e: (e[0], e[1]))
+        self._heap.remove(victim)
+        heapq.heapify(self._heap)
+        self.dropped_full += 1
+
+    def _next(self):
+        """Most urgent item that is not stale, or None once closed."""
+        with self._cond:
+            while True:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return None
+                _, _, item = heapq.heappop(self._heap)
+                waited = time.time() - item["arrived"]
+                if item["priority"] < self.stale_below and waited > self.stale_secs:
+                    self.dropped_stale += 1
+                    continue
+                self._current = item
+                return item
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            lag = time.time() - item["arrived"]
+            if not item.get("resumed"):
+                self.played += 1
+                self._lag_sum += lag
+                self.lag_last = lag
+                self.lag_max = max(self.lag_max, lag)
+                if item["capture_ts"]:
+                    print(f"[{item['session_id']}] playing priority {item['priority']} after {lag:.2f}s in queue; "
+                          f"approx end-to-end latency (s): {time.time() - item['capture_ts']:.3f}")
+            sentences = [s for s in _SENTENCE.split(item["text"]) if s.strip()] or [item["text"]]
+            for i, sentence in enumerate(sentences):
+                if item.get("preempted"):  # arrived between two sentences
+                    self._interrupted(item, sentences[i:])
+                    break
+                try:
+                    finished = self.speaker.say(sentence, item["priority"])
+                except Exception as e:
+                    print(f"TTS error: {e}")
+                    break
+                if item.get("preempted") and (not finished or i + 1 < len(sentences)):
+                    self._interrupted(item, sentences[i + (1 if finished else 0):])
+                    break
+            with self._cond:
+                self._current = None
+
+    def _interrupted(self, item, rest):
+        self.preempted += 1
+        print(f"[{item['session_id']}] playback interrupted for a higher-priority message.")
+        if REQUEUE_INTERRUPTED and rest:
+            with self._cond:
+                # Keeps its original arrival time, so staleness still applies
+                self._push(dict(item, text=" ".join(rest), preempted=False, resumed=True))
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._heap)
+            oldest = min((e[2]["arrived"] for e in self._heap), default=None)
+        return {"depth": depth, "played": self.played, "dropped_stale": self.dropped_stale,
+                "dropped_full": self.dropped_full, "preempted": self.preempted,
+                "lag_last": self.lag_last, "lag_max": self.lag_max,
+                "lag_mean": self._lag_sum / self.played if self.played else 0.0,
+                "oldest_wait": time.time() - oldest if oldest else 0.0}
@@ -1,101 +1,91 @@
 
 # receiver/receiver.py
-import asyncio, websockets, json, time
-import pyttsx3
-from functools import partial
+import argparse, asyncio, websockets, json
+import playback
+from playback import PlaybackQueue, Pyttsx3Speaker, DryRunSpeaker
 
 WS_URI = "ws://localhost:8765"
 
 # Filter: Minimum number of characters required for a message to be considered real speech.
 # Text shorter than this is classified as garbage/silence.
-MIN_SPEECH_LENGTH = 5 
-SILENCE_TEXT = "No text received"
+MIN_SPEECH_LENGTH = 5
 
-# Initialize pyttsx3 engine once
-try:
-    engine = pyttsx3.init()
-except Exception as e:
-    print(f"Error initializing pyttsx3: {e}")
+# Playback runs on its own thread (see playback.py): the most urgent message is
+# spoken first, a much more urgent one interrupts the current utterance, and
+# low-priority messages that waited too long are skipped.
+STATS_INTERVAL_SECS = 30
 
-def adapt_engine(polarity, priority):
-    """Synchronous function to set pyttsx3 properties based on data."""
-    if priority >= 8:
-        engine.setProperty('rate', 200)
-    else:
-        engine.setProperty('rate', 150)
+async def report_playback(player):
+    while True:
+        await asyncio.sleep(STATS_INTERVAL_SECS)
+        s = player.stats()
+        print(f"Playback: queue {s['depth']} (oldest {s['oldest_wait']:.1f}s), played {s['played']}, "
+              f"lag mean {s['lag_mean']:.2f}s max {s['lag_max']:.2f}s, preempted {s['preempted']}, "
+              f"dropped stale {s['dropped_stale']} / full {s['dropped_full']}")
 
-def synthesize_speech(text, priority, polarity):
-    """
-    Synchronous function to perform the blocking TTS operation.
-    """
-    # Use a slightly lower rate for system messages like "No text received"
-    if text == SILENCE_TEXT:
-        engine.setProperty('rate', 130)
-    else:
-        adapt_engine(polarity, priority)
-        
-    print(f"Synthesizing speech: {text[:50]}...")
-    engine.say(text)
-    engine.runAndWait()
-
-async def run():
+async def run(player, ws_uri=WS_URI, sessions=None, min_priority=0):
     try:
-        async with websockets.connect(WS_URI) as ws:
-            # 1. Register as a receiver
-            await ws.send(json.dumps({"type":"register","role":"receiver","session_id":"receiver1"}))
+        async with websockets.connect(ws_uri) as ws:
+            # 1. Register as a receiver (the node only forwards matching sessions/priorities)
+            await ws.send(json.dumps({"type":"register","role":"receiver","session_id":"receiver1",
+                                      "sessions":sessions,"min_priority":min_priority}))
             print("Receiver registered")
-            
-            loop = asyncio.get_running_loop()
-            
-            # 2. Main message loop
+
+            # 2. Main message loop (never waits for speech; playback has its own thread)
             async for msg in ws:
                 try:
                     obj = json.loads(msg)
                     if obj.get("type") == "semantic":
                         p = obj["payload"]
-                        
+
                         text = p.get('text', '').strip()
-                        priority = p.get("priority", 1) 
-                        polarity = p.get("polarity", 0) 
+                        priority = p.get("priority", 1)
 
                         # --- SIMPLE FILTER: DROP EMPTY/GARBAGE ---
-                        MIN_SPEECH_LENGTH = 5
                         if not text or len(text) < MIN_SPEECH_LENGTH:
                             print(f"[{p.get('session_id', 'N/A')}] FILTERED: silence/garbage skipped.")
                             continue
                         # -----------------------------------------
 
                         print(f"[{p.get('session_id', 'N/A')}] priority={priority} sentiment={p.get('sentiment')} text={text}")
+                        player.offer(text, priority, p.get("session_id"), p.get("capture_ts") or p.get("forward_ts"))
 
-                        tts_task = loop.run_in_executor(
-                            None, 
-                            partial(synthesize_speech, text, priority, polarity)
-                        )
-                        await tts_task 
-
-                        # Latency estimate
-                        try:
-                            latency = time.time() - float(p.get("capture_ts") or p.get("forward_ts") or time.time())
-                            print("approx end-to-end latency (s):", round(latency,3))
-                        except:
-                            pass
-                
                 except Exception as e:
                     print("recv err (processing message):", e)
 
-    except ConnectionRefusedError: 
-        print(f"Connection refused: Is the server running at {WS_URI}?")
+    except ConnectionRefusedError:
+        print(f"Connection refused: Is the server running at {ws_uri}?")
     except websockets.exceptions.ConnectionClosedError as e:
         print(f"Connection closed by server: {e}")
     except Exception as e:
         print("An unexpected error occurred:", e)
 
+async def main(player, ws_uri=WS_URI, sessions=None, min_priority=0):
+    asyncio.create_task(report_playback(player))
+    await run(player, ws_uri, sessions, min_priority)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XAIONET WebSocket Receiver Client.")
+    parser.add_argument("--ws", default=WS_URI, help="WebSocket URI of the node.")
+    parser.add_argument("--sessions", nargs="*", help="Only receive these session IDs (default: all).")
+    parser.add_argument("--min-priority", type=int, default=0, help="Only receive messages at or above this priority.")
+    parser.add_argument("--max-queue", type=int, default=playback.MAX_QUEUE, help="Messages waiting for playback before the least urgent is dropped.")
+    parser.add_argument("--stale-secs", type=float, default=playback.STALE_SECS, help="Skip low-priority messages that waited longer than this.")
+    parser.add_argument("--stale-below", type=int, default=playback.STALE_BELOW_PRIORITY, help="Only messages below this priority are dropped as stale.")
+    parser.add_argument("--preempt-margin", type=int, default=playback.PREEMPT_MARGIN, help="Interrupt playback for messages at least this much more urgent.")
+    parser.add_argument("--no-requeue", action="store_true", help="Drop the rest of an interrupted message instead of speaking it later.")
+    parser.add_argument("--no-audio", action="store_true", help="Print messages at speaking pace instead of using pyttsx3.")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL_SECS, help="Seconds between playback stats lines.")
+    args = parser.parse_args()
+    STATS_INTERVAL_SECS = args.stats_interval
+    playback.REQUEUE_INTERRUPTED = not args.no_requeue
+
+    player = PlaybackQueue(DryRunSpeaker() if args.no_audio else Pyttsx3Speaker(), max_queue=args.max_queue,
+                           stale_secs=args.stale_secs, stale_below=args.stale_below,
+                           preempt_margin=args.preempt_margin).start()
     try:
-        asyncio.run(run())
+        asyncio.run(main(player, args.ws, args.sessions, args.min_priority))
     except KeyboardInterrupt:
         print("\nReceiver shutting down.")
     finally:
-        if 'engine' in locals():
-            pass
+        player.close()
@@ -0,0 +1,205 @@
+# sender/audio_source.py
+"""
+Continuous audio capture for the sender.
+
+A source (microphone callback stream, WAV file or raw PCM on stdin) keeps
+writing int16 samples into a NumPy ring buffer from its own thread, while the
+asyncio loop cuts chunks out of the ring and sends them. Recording never stops
+while a chunk is being encoded or sent, so no audio is lost between chunks.
+"""
+import asyncio, sys, threading, time
+import numpy as np
+import soundfile as sf
+from utils.audio_utils import resample_linear
+
+RING_SECS = 30.0     # how far the sender may fall behind before audio is overwritten
+BLOCK_SECS = 0.05    # capture callback / file read granularity
+
+class Overrun(Exception):
+    pass
+
+class RingBuffer:
+    """Single-writer ring of int16 samples addressed by absolute sample index."""
+
+    def __init__(self, capacity, samplerate):
+        self.capacity = capacity
+        self.samplerate = samplerate
+        self.total = 0          # samples written since start
+        self.last_ts = None     # wall time of the newest sample
+        self._buf = np.zeros(capacity, dtype=np.int16)
+        self._lock = threading.Lock()
+
+    def write(self, samples):
+        n = len(samples)
+        with self._lock:
+            if n > self.capacity:
+                self.total += n - self.capacity
+                samples = samples[-self.capacity:]
+                n = self.capacity
+            pos = self.total % self.capacity
+            first = min(n, self.capacity - pos)
+            self._buf[pos:pos + first] = samples[:first]
+            self._buf[:n - first] = samples[first:]
+            self.total += n
+            self.last_ts = time.time()
+
+    def read(self, start, n):
+        """Copies samples [start, start+n). Returns (samples, wall time of the last one)."""
+        with self._lock:
+            if start < self.total - self.capacity:
+                raise Overrun(f"samples from {start} already overwritten")
+            pos = start % self.capacity
+            first = min(n, self.capacity - pos)
+            out = np.concatenate((self._buf[pos:pos + first], self._buf[:n - first]))
+            end_ts = self.last_ts - (self.total - (start + n)) / self.samplerate
+        return out, end_ts
+
+class AudioSource:
+    """Base class: subclasses call _on_samples() from their capture thread."""
+
+    def __init__(self, samplerate, ring_secs=RING_SECS):
+        self.samplerate = samplerate
+        self.ring = RingBuffer(int(ring_secs * samplerate), samplerate)
+        self.finished = False
+        self.read_pos = 0       # oldest sample the reader still needs
+        self._loop = None
+        self._data_event = None
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def _notify(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._data_event.set)
+
+    def _on_samples(self, samples):
+        self.ring.write(samples)
+        self._notify()
+
+    def _on_finished(self):
+        self.finished = True
+        self._notify()
+
+    async def wait_for(self, n):
+        """Waits until n samples have been captured in total, or the source ends."""
+        while self.ring.total < n and not self.finished:
+            self._data_event.clear()
+            if self.ring.total >= n or self.finished:
+                break
+            await self._data_event.wait()
+
+    def open(self):
+        """Starts capturing; must be called from the event loop that will read chunks."""
+        self._loop = asyncio.get_running_loop()
+        self._data_event = asyncio.Event()
+        self.start()
+
+    async def chunks(self, chunk_secs, overlap_secs=0.0):
+        """Yields (capture_ts, int16 samples) chunks of chunk_secs, overlapping by overlap_secs."""
+        chunk_len = int(chunk_secs * self.samplerate)
+        hop = max(chunk_len - int(overlap_secs * self.samplerate), 1)
+        pos = 0
+        self.open()
+        try:
+            while True:
+                await self.wait_for(pos + chunk_len)
+                end = min(pos + chunk_len, self.ring.total)
+                if end <= pos:
+                    return
+                try:
+                    data, capture_ts = self.ring.read(pos, end - pos)
+                except Overrun:
+                    skipped = self.ring.total - chunk_len - pos
+                    print(f"WARN: sender fell behind; skipped {skipped / self.samplerate:.1f}s of audio.")
+                    pos = self.ring.total - chunk_len
+                    continue
+                yield capture_ts, data
+                if end < pos + chunk_len:
+                    return  # final partial chunk of a finished source
+                pos += hop
+                self.read_pos = pos
+        finally:
+            self.stop()
+
+class MicSource(AudioSource):
+    """Callback-driven sounddevice input stream."""
+
+    def start(self):
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            if status:
+                print("Audio input status:", status)
+            self._on_samples(indata[:, 0])
+
+        self._stream = sd.InputStream(samplerate=self.samplerate, channels=1, dtype='int16',
+                                      blocksize=int(self.samplerate * BLOCK_SECS), callback=callback)
+        self._stream.start()
+
+    def stop(self):
+        self._stream.stop()
+        self._stream.close()
+
+class FileSource(AudioSource):
+    """
+    Replays an audio file, or raw int16 mono PCM at the sender's rate from
+    stdin when path is "-", for headless testing. With realtime=True it is
+    paced like a live microphone.
+    """
+
+    def __init__(self, path, samplerate, realtime=True, ring_secs=RING_SECS):
+        super().__init__(samplerate, ring_secs)
+        self.path = path
+        self.realtime = realtime
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="file-source", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _blocks(self):
+        block = int(self.samplerate * BLOCK_SECS)
+        if self.path == "-":
+            while True:
+                raw = sys.stdin.buffer.read(block * 2)
+                if not raw:
+                    return
+                yield np.frombuffer(raw[:len(raw) // 2 * 2], dtype="<i2")
+        with sf.SoundFile(self.path) as f:
+            file_block = int(f.samplerate * BLOCK_SECS)
+            for data in f.blocks(blocksize=file_block, dtype='float32', always_2d=True):
+                mono = resample_linear(data.mean(axis=1), f.samplerate, self.samplerate)
+                yield (np.clip(mono, -1.0, 1.0) * 32767).astype(np.int16)
+
+    def _run(self):
+        started = time.time()
+        sent = 0
+        try:
+            for samples in self._blocks():
+                if self._stop.is_set():
+                    return
+                self._on_samples(samples)
+                sent += len(samples)
+                # Unpaced replay must not lap the reader
+                while not self.realtime and self.ring.total - self.read_pos > self.ring.capacity // 2:
+                    if self._stop.wait(0.01):
+                        return
+                if self.realtime:
+                    delay = started + sent / self.samplerate - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+        except Exception as e:
+            print(f"Audio source error ({self.path}): {e}")
+        finally:
+            self._on_finished()
+
+def open_source(source, samplerate, realtime=True):
+    """'mic' for the default input device, otherwise a file path or '-' for stdin."""
+    if source == "mic":
+        return MicSource(samplerate)
+    return FileSource(source, samplerate, realtime=realtime)
@@ -0,0 +1,141 @@
+# sender/chunker.py
+"""
+Speech-boundary chunking for the sender.
+
+Instead of fixed CHUNK_SECS blocks, audio is classified frame by frame and a
+segment is emitted as soon as the speaker pauses (or a maximum duration is
+reached). Nothing is sent while the line is silent. A short pre-roll before
+the first speech frame is included so the start of a word is not clipped.
+"""
+import numpy as np
+from utils.vad import StreamingVad, FRAME_MS
+from audio_source import Overrun
+
+MAX_SEGMENT_SECS = 10.0   # force a cut in long monologues
+PAUSE_MS = 500            # this much silence ends a segment
+PRE_ROLL_MS = 300         # audio kept before speech starts (and overlap after a forced cut)
+MIN_SPEECH_MS = 250       # segments with less speech than this are dropped as clicks/noise
+
+class SegmentStats:
+
+    def __init__(self, samplerate):
+        self.samplerate = samplerate
+        self.segments = 0
+        self.by_pause = 0
+        self.by_max_duration = 0
+        self.dropped_short = 0
+        self.sent_samples = 0
+        self.total_samples = 0
+        self.longest = 0.0
+
+    def record(self, n_samples, reason):
+        self.segments += 1
+        self.sent_samples += n_samples
+        self.longest = max(self.longest, n_samples / self.samplerate)
+        if reason == "pause":
+            self.by_pause += 1
+        elif reason == "max_duration":
+            self.by_max_duration += 1
+
+    def report(self):
+        total = self.total_samples / self.samplerate
+        sent = self.sent_samples / self.samplerate
+        avg = sent / self.segments if self.segments else 0.0
+        saved = 100.0 * (1 - sent / total) if total else 0.0
+        return (f"{self.segments} segments (pause {self.by_pause}, max-duration {self.by_max_duration}, "
+                f"dropped {self.dropped_short}), avg {avg:.1f}s, longest {self.longest:.1f}s; "
+                f"sent {sent:.1f}s of {total:.1f}s captured ({saved:.0f}% silence not sent)")
+
+async def vad_segments(source, max_segment_secs=MAX_SEGMENT_SECS, pause_ms=PAUSE_MS,
+                       pre_roll_ms=PRE_ROLL_MS, stats=None, backend="energy"):
+    """Yields (capture_ts, int16 samples) for each detected speech segment."""
+    sr = source.samplerate
+    vad = StreamingVad(sr, FRAME_MS, backend)
+    frame_len = vad.frame_len
+    pause_frames = max(pause_ms // FRAME_MS, 1)
+    pre_roll = int(pre_roll_ms * sr / 1000)
+    max_len = int(max_segment_secs * sr)
+    min_speech_frames = max(MIN_SPEECH_MS // FRAME_MS, 1)
+    stats = stats or SegmentStats(sr)
+
+    pos = 0              # next frame to classify
+    seg_start = None     # sample index where the current segment starts
+    last_speech_end = 0  # end of the newest speech frame in the segment
+    speech_frames = 0
+    silent_run = 0
+
+    def skip_to_oldest(start):
+        """After an overrun: the oldest sample still in the ring, logging the gap."""
+        oldest = source.ring.total - source.ring.capacity
+        print(f"WARN: sender fell behind; skipped {(oldest - start) / sr:.1f}s of audio.")
+        return oldest
+
+    def emit(end, reason):
+        nonlocal seg_start, speech_frames
+        start = seg_start
+        seg_start = None
+        if speech_frames < min_speech_frames:
+            stats.dropped_short += 1
+            return None
+        while True:
+            if start >= end:
+                return None  # the whole segment was overwritten
+            try:
+                data, capture_ts = source.ring.read(start, end - start)
+                break
+            except Overrun:
+                start = skip_to_oldest(start)  # send what is left of the segment
+        stats.record(len(data), reason)
+        return capture_ts, data
+
+    source.open()
+    try:
+        while True:
+            await source.wait_for(pos + frame_len)
+            if source.ring.total < pos + frame_len:
+                break  # source finished
+            try:
+                frame, _ = source.ring.read(pos, frame_len)
+            except Overrun:
+                # The event loop stalled longer than the ring holds; resume from the oldest sample
+                pos = skip_to_oldest(pos)
+                continue
+            pos += frame_len
+            stats.total_samples += frame_len
+            speech = vad.is_speech(frame.astype(np.float32) / 32768.0)
+
+            if seg_start is None:
+                source.read_pos = max(pos - pre_roll - frame_len, 0)
+                if speech:
+                    seg_start = max(pos - frame_len - pre_roll, source.ring.total - source.ring.capacity, 0)
+                    speech_frames, silent_run, last_speech_end = 1, 0, pos
+                continue
+
+            if speech:
+                speech_frames += 1
+                silent_run = 0
+                last_speech_end = pos
+            else:
+                silent_run += 1
+
+            if silent_run >= pause_frames:
+                # Keep a little trailing audio after the last word
+                seg = emit(min(last_speech_end + pre_roll, pos), "pause")
+                if seg:
+                    yield seg
+            elif pos - seg_start >= max_len:
+                seg = emit(pos, "max_duration")
+                if seg:
+                    yield seg
+                # Carry a short overlap into the next segment so a split word survives
+                seg_start = max(pos - pre_roll, 0)
+                speech_frames, silent_run, last_speech_end = 1, 0, pos
+            if seg_start is not None:
+                source.read_pos = seg_start
+
+        if seg_start is not None:
+            seg = emit(min(last_speech_end + pre_roll, source.ring.total), "end")
+            if seg:
+                yield seg
+    finally:
+        source.stop()
@@ -1,60 +1,235 @@
-import argparse, asyncio, json, time, io
-import sounddevice as sd
+import argparse, asyncio, json, time, io, os, sys, random
+import numpy as np
 import soundfile as sf
 import websockets
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.wire_protocol import pack_chunk, unpack_chunk, encode_audio, ENCODINGS, ENC_PCM16
+from audio_source import open_source
+from chunker import vad_segments, SegmentStats, MAX_SEGMENT_SECS, PAUSE_MS
+from spool import Spool, MAX_SPOOL_MB
 
 # Configuration
 SR = 16000
 CHUNK_SECS = 5.0
+OVERLAP_SECS = 0.0    # audio repeated at the start of the next chunk so words at edges survive
+PROTOCOL = "binary"   # "binary" (one frame per chunk) or "json" (legacy header + WAV frame)
+CODEC = "pcm16"       # binary protocol payload: "pcm16" or "flac"
+CHUNKING = "vad"      # "vad": cut at speech pauses, send nothing in silence; "fixed": CHUNK_SECS blocks
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool")
+DRAIN_RATE = 2.0      # max chunks/s while draining a backlog, so a reconnecting fleet does not stampede the node
+MIN_BACKOFF_SECS = 1.0
+MAX_BACKOFF_SECS = 30.0
+FINAL_ACK_TIMEOUT_SECS = 30.0
 
-async def send_loop(ws_uri, session_id):
+def frames_for_protocol(frame, protocol=PROTOCOL):
+    """Returns the WebSocket frames that carry one spooled chunk."""
+    if protocol == "binary":
+        # Header fields and raw audio travel in a single frame
+        return [frame]
+
+    # Legacy path: convert audio to WAV bytes
+    header, payload = unpack_chunk(frame)
+    if header["encoding"] == ENC_PCM16:
+        data = np.frombuffer(payload, dtype="<i2")
+    else:
+        data, _ = sf.read(io.BytesIO(bytes(payload)), dtype='int16')
+    buf = io.BytesIO()
+    sf.write(buf, data, header["sample_rate"], format='WAV')
+    wav_bytes = buf.getvalue()
+
+    # Header, then binary audio data
+    header = {
+        "type":"audio_chunk",
+        "session_id":header["session_id"],
+        "seq": header["seq"],
+        "capture_ts": header["capture_ts"],
+        "audio_size": len(wav_bytes)
+    }
+    return [json.dumps(header), wav_bytes]
+
+def open_chunks(source, chunking, chunk_secs, overlap_secs, max_segment_secs, pause_ms, stats):
+    """Async iterator of (capture_ts, int16 samples) for the chosen chunking mode."""
+    if chunking == "vad":
+        return vad_segments(source, max_segment_secs, pause_ms, stats=stats)
+    return source.chunks(chunk_secs, overlap_secs)
+
+class RateLimiter:
+    """Token bucket: at most rate sends per second, with a small burst."""
+
+    def __init__(self, rate, burst=2):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    async def wait(self):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self.tokens = 1
+            self.last = time.monotonic()
+        self.tokens -= 1
+
+async def capture_loop(spool, session_id, codec, chunks, stats, chunking, new_chunk):
+    """Captures and spools chunks regardless of whether the node is reachable."""
+    encoding = ENCODINGS[codec]
+    n = 0
+    async for capture_ts, data in chunks:
+        seq = spool.next_seq()
+        frame = pack_chunk(session_id, seq, capture_ts, encode_audio(data, SR, encoding), SR, encoding)
+        await asyncio.to_thread(spool.put, seq, frame)
+        new_chunk.set()
+        n += 1
+        if chunking == "vad" and n % 20 == 0:
+            print("Segment stats:", stats.report())
+    print("Audio source finished.")
+    if chunking == "vad":
+        print("Segment stats:", stats.report())
+
+async def read_acks(ws, spool):
+    async for msg in ws:
+        try:
+            obj = json.loads(msg)
+        except Exception:
+            continue
+        if obj.get("type") == "ack":
+            spool.ack(int(obj["seq"]))
+        elif obj.get("type") == "dropped":
+            spool.ack(int(obj["seq"]))
+            print(f"Node dropped chunk {obj['seq']} (overloaded).")
+        elif obj.get("type") == "overload":
+            print(f"Node overloaded: {obj.get('reason')}")
+
+async def send_spooled(ws, spool, protocol, limiter, new_chunk, acks, capture_task):
+    """Sends every spooled chunk in order, then waits for more until capture ends."""
+    last_sent = -1
+    while True:
+        pending = spool.pending(last_sent)
+        if not pending:
+            if capture_task.done():
+                return
+            new_chunk.clear()
+            waiter = asyncio.create_task(new_chunk.wait())
+            done, _ = await asyncio.wait({waiter, acks, capture_task}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if acks in done:
+                acks.result()
+                raise ConnectionError("node closed the connection")
+            continue
+        for i, seq in enumerate(pending):
+            frame = await asyncio.to_thread(spool.read, seq)
+            if frame is None:
+                continue  # acked or dropped meanwhile
+            # Only backlog is throttled; the newest chunk (live audio) goes out at once
+            if i < len(pending) - 1:
+                await limiter.wait()
+            for f in frames_for_protocol(frame, protocol):
+                await ws.send(f)
+            last_sent = seq
+            print(f"[{time.strftime('%H:%M:%S')}] Sent chunk {seq} ({len(spool)} spooled)")
+
+async def deliver_loop(ws_uri, session_id, spool, protocol, drain_rate, new_chunk, capture_task):
+    """Keeps a connection to the node, reconnecting with exponential backoff."""
+    backoff = MIN_BACKOFF_SECS
+    limiter = RateLimiter(drain_rate)
+    while True:
+        try:
+            async with websockets.connect(ws_uri) as ws:
+                # 1. Register
+                await ws.send(json.dumps({"type":"register","role":"sender","session_id":session_id,
+                                          "stream_id":spool.stream_id}))
+                print(f"registered as sender: {session_id} ({len(spool)} chunks spooled)")
+                backoff = MIN_BACKOFF_SECS
+                acks = asyncio.create_task(read_acks(ws, spool))
+                try:
+                    # 2. Send the backlog, then live chunks as they are captured
+                    await send_spooled(ws, spool, protocol, limiter, new_chunk, acks, capture_task)
+                    deadline = time.monotonic() + FINAL_ACK_TIMEOUT_SECS
+                    while len(spool) and not acks.done() and time.monotonic() < deadline:
+                        await asyncio.sleep(0.1)
+                    if len(spool):
+                        print(f"{len(spool)} chunks still unacknowledged; they stay in {spool.directory}.")
+                    return
+                finally:
+                    acks.cancel()
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            delay = backoff * random.uniform(0.8, 1.2)
+            print(f"Connection to {ws_uri} unavailable ({e}); retrying in {delay:.1f}s, "
+                  f"{len(spool)} chunks spooled ({spool.dropped} dropped).")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, MAX_BACKOFF_SECS)
+
+def capture_error(task):
+    """The capture task's exception, or None while it runs or if it ended cleanly."""
+    if not task.done() or task.cancelled():
+        return None
+    return task.exception()
+
+def capture_failed(task, delivery):
+    error = capture_error(task)
+    if error is not None:
+        print(f"Audio capture failed: {error!r}")
+        delivery.cancel()
+
+async def send_loop(ws_uri, session_id, protocol=PROTOCOL, codec=CODEC, source="mic",
+                    chunk_secs=CHUNK_SECS, overlap_secs=OVERLAP_SECS, realtime=True,
+                    chunking=CHUNKING, max_segment_secs=MAX_SEGMENT_SECS, pause_ms=PAUSE_MS,
+                    spool_dir=SPOOL_DIR, max_spool_mb=MAX_SPOOL_MB, drain_rate=DRAIN_RATE):
+    stats = SegmentStats(SR)
+    spool = Spool(os.path.join(spool_dir, session_id), int(max_spool_mb * 1024 * 1024))
+    if len(spool):
+        print(f"Resuming with {len(spool)} spooled chunks from a previous run.")
+
+    if chunking == "vad":
+        print(f"Capturing from {source}; segments end at {pause_ms}ms pauses (max {max_segment_secs}s)...")
+    else:
+        print(f"Capturing from {source} in {chunk_secs}s chunks (overlap {overlap_secs}s)...")
+    chunks = open_chunks(open_source(source, SR, realtime), chunking, chunk_secs, overlap_secs,
+                         max_segment_secs, pause_ms, stats)
+    new_chunk = asyncio.Event()
+    capture_task = asyncio.create_task(capture_loop(spool, session_id, codec, chunks, stats, chunking, new_chunk))
+    delivery = asyncio.create_task(deliver_loop(ws_uri, session_id, spool, protocol, drain_rate, new_chunk, capture_task))
+    # A failed capture stops delivery too, instead of leaving it retrying with nothing new to send
+    capture_task.add_done_callback(lambda t: capture_failed(t, delivery))
     try:
-        async with websockets.connect(ws_uri) as ws:
-            # 1. Register
-            await ws.send(json.dumps({"type":"register","role":"sender","session_id":session_id}))
-            print("registered as sender:", session_id)
-            
-            # 2. Main send loop
-            while True:
-                # User feedback: Confirm recording has started
-                print(f"[{time.strftime('%H:%M:%S')}] Recording {CHUNK_SECS}s chunk...")
-                
-                # Record the audio chunk
-                data = sd.rec(int(CHUNK_SECS * SR), samplerate=SR, channels=1, dtype='int16')
-                sd.wait() # Block and wait for recording to finish
-
-                # Convert audio to WAV bytes
-                buf = io.BytesIO()
-                sf.write(buf, data, SR, format='WAV')
-                wav_bytes = buf.getvalue()
-                
-                # Create and send header
-                header = {
-                    "type":"audio_chunk",
-                    "session_id":session_id,
-                    "capture_ts": time.time(), 
-                    "audio_size": len(wav_bytes)
-                }
-                await ws.send(json.dumps(header))
-                
-                # Send binary audio data
-                await ws.send(wav_bytes) 
-                
-                await asyncio.sleep(0.01) # Small pause
-                
-    except ConnectionRefusedError:
-        print(f"Error: Connection refused. Is the server running at {ws_uri}?")
+        await delivery
+    except asyncio.CancelledError:
+        if capture_error(capture_task) is None:
+            raise
+        print(f"Sender stopped; {len(spool)} chunks stay in {spool.directory}.")
     except Exception as e:
         print(f"An error occurred in sender loop: {e}")
+    finally:
+        capture_task.cancel()
+        delivery.cancel()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="AIONETx WebSocket Sender Client.")
     parser.add_argument("--ws", default="ws://localhost:8765", help="WebSocket URI for the AIONETx server.")
     parser.add_argument("--session", default="call1", help="Session ID for this sender.")
+    parser.add_argument("--protocol", choices=["binary", "json"], default=PROTOCOL, help="Wire format; 'json' is the legacy header + WAV pair.")
+    parser.add_argument("--codec", choices=["pcm16", "flac"], default=CODEC, help="Audio payload encoding for the binary protocol.")
+    parser.add_argument("--source", default="mic", help="'mic', an audio file path, or '-' for raw 16 kHz int16 PCM on stdin.")
+    parser.add_argument("--chunk-secs", type=float, default=CHUNK_SECS, help="Chunk length in seconds.")
+    parser.add_argument("--overlap-secs", type=float, default=OVERLAP_SECS, help="Overlap between consecutive chunks in seconds.")
+    parser.add_argument("--fast", action="store_true", help="Replay file/stdin sources as fast as possible instead of in real time.")
+    parser.add_argument("--chunking", choices=["vad", "fixed"], default=CHUNKING, help="Cut at speech pauses (vad) or in fixed --chunk-secs blocks.")
+    parser.add_argument("--max-segment-secs", type=float, default=MAX_SEGMENT_SECS, help="Longest VAD segment before a forced cut.")
+    parser.add_argument("--pause-ms", type=int, default=PAUSE_MS, help="Silence that ends a VAD segment.")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="Directory for chunks not yet acknowledged by the node.")
+    parser.add_argument("--max-spool-mb", type=float, default=MAX_SPOOL_MB, help="Spool size limit; oldest chunks are dropped beyond it.")
+    parser.add_argument("--drain-rate", type=float, default=DRAIN_RATE, help="Max chunks per second sent while draining a backlog (0 = unlimited).")
     args = parser.parse_args()
     
     try:
-        asyncio.run(send_loop(args.ws, args.session))
+        asyncio.run(send_loop(args.ws, args.session, args.protocol, args.codec, args.source,
+                              args.chunk_secs, args.overlap_secs, not args.fast,
+                              args.chunking, args.max_segment_secs, args.pause_ms,
+                              args.spool_dir, args.max_spool_mb, args.drain_rate))
     except KeyboardInterrupt:
         print("\nSender shutting down.")
@@ -0,0 +1,103 @@
+# sender/spool.py
+"""
+Bounded on-disk spool of outgoing chunks.
+
+Every captured chunk is written here (as a binary protocol frame) before it is
+sent, and deleted only once the node acknowledges that sequence number (acks
+are per chunk, not cumulative: it is either processed or was dropped). If the
+link drops, capture keeps filling the spool and the backlog is resent in order
+after reconnecting. When the spool is full the oldest chunks are discarded.
+"""
+import json, os, threading, uuid
+
+MAX_SPOOL_MB = 200
+STATE_FILE = "state.json"
+
+class Spool:
+
+    def __init__(self, directory, max_bytes=MAX_SPOOL_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._sizes = {}   # seq -> bytes on disk
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".chunk"):
+                self._sizes[int(name[:-6])] = os.path.getsize(os.path.join(directory, name))
+        # Sequence numbers keep increasing across restarts so the node's dedupe stays
+        # valid; stream_id changes only if the spool is wiped, which resets the dedupe.
+        self._next_seq = max(self._sizes, default=-1) + 1
+        self.stream_id = None
+        try:
+            with open(os.path.join(directory, STATE_FILE)) as f:
+                state = json.load(f)
+            self._next_seq = max(self._next_seq, state["next_seq"])
+            self.stream_id = state["stream_id"]
+        except (OSError, ValueError, KeyError):
+            pass
+        self.stream_id = self.stream_id or uuid.uuid4().hex
+
+    def _path(self, seq):
+        return os.path.join(self.directory, f"{seq:010d}.chunk")
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def size_bytes(self):
+        return sum(self._sizes.values())
+
+    def next_seq(self):
+        """Reserves the next sequence number (in memory; put() persists the counter)."""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        return seq
+
+    def _save_state(self):
+        with self._lock:
+            state = {"next_seq": self._next_seq, "stream_id": self.stream_id}
+        tmp = os.path.join(self.directory, STATE_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, os.path.join(self.directory, STATE_FILE))
+
+    def put(self, seq, frame):
+        """Writes one chunk and the sequence counter; blocking, so callers run it in a thread."""
+        tmp = self._path(seq) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(frame)
+        os.replace(tmp, self._path(seq))
+        # After the chunk, so a crash in between still restarts above max(spooled seq)
+        self._save_state()
+        with self._lock:
+            self._sizes[seq] = len(frame)
+            while len(self._sizes) > 1 and sum(self._sizes.values()) > self.max_bytes:
+                oldest = min(self._sizes)
+                self._remove(oldest)
+                self.dropped += 1
+
+    def _remove(self, seq):
+        self._sizes.pop(seq, None)
+        try:
+            os.remove(self._path(seq))
+        except FileNotFoundError:
+            pass
+
+    def ack(self, seq):
+        """The node is done with this one chunk; forget it."""
+        with self._lock:
+            self._remove(seq)
+
+    def pending(self, after=-1):
+        """Spooled sequence numbers greater than after, oldest first."""
+        with self._lock:
+            return sorted(s for s in self._sizes if s > after)
+
+    def read(self, seq):
+        """Returns the spooled frame, or None if it was dropped or acked meanwhile."""
+        try:
+            with open(self._path(seq), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
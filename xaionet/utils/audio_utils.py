@@ -1,7 +1,10 @@
 # utils/audio_utils.py
 import io
+import numpy as np
 import soundfile as sf
 
+WHISPER_SR = 16000
+
 def wav_bytes_from_array(np_audio, samplerate=16000):
     """
     Convert numpy array to WAV bytes (mono).
@@ -10,3 +13,21 @@ def wav_bytes_from_array(np_audio, samplerate=16000):
     sf.write(buf, np_audio, samplerate, format='WAV')
     return buf.getvalue()
 
+def resample_linear(samples, src_sr, dst_sr=WHISPER_SR):
+    """
+    Cheap linear-interpolation resampler; good enough for speech into Whisper.
+    """
+    if src_sr == dst_sr or len(samples) == 0:
+        return samples
+    n_out = int(round(len(samples) * dst_sr / src_sr))
+    x_out = np.arange(n_out, dtype=np.float64) * (src_sr / dst_sr)
+    return np.interp(x_out, np.arange(len(samples)), samples).astype(np.float32)
+
+def decode_audio_bytes(data, target_sr=WHISPER_SR):
+    """
+    Decode WAV (or any libsndfile container) bytes in-process to a mono
+    float32 array at target_sr, the format Whisper consumes directly.
+    """
+    samples, sr = sf.read(io.BytesIO(data), dtype='float32', always_2d=True)
+    samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    return np.ascontiguousarray(resample_linear(samples, sr, target_sr), dtype=np.float32)
@@ -0,0 +1,105 @@
+# utils/vad.py
+"""
+Cheap vectorized voice-activity detection on float32 mono audio.
+
+The default "energy" backend classifies fixed frames by RMS energy against an
+adaptive noise floor, and uses zero-crossing rate to reject hiss that is only
+just above it. If the optional webrtcvad package is installed it can be used
+instead with backend="webrtc".
+"""
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+FRAME_MS = 30
+ENERGY_THRESHOLD_DB = -45.0   # absolute floor, dBFS
+NOISE_MARGIN_DB = 10.0        # speech must be this far above the estimated noise floor
+MAX_THRESHOLD_DB = -30.0      # cap so a chunk that is all speech still passes
+ZCR_NOISE = 0.35              # high zero-crossing rate + low energy = broadband noise
+HANGOVER_MS = 200             # keep this much audio around speech so word edges survive
+MIN_SPEECH_MS = 250           # less speech than this and the chunk counts as silent
+
+_webrtc = None
+
+def frame_signal(samples, sr, frame_ms=FRAME_MS):
+    """Returns a (n_frames, frame_len) view of samples; the tail remainder is ignored."""
+    frame_len = int(sr * frame_ms / 1000)
+    n_frames = len(samples) // frame_len
+    return samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+
+def _energy_frames(frames):
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    db = 20.0 * np.log10(rms + 1e-10)
+    noise_floor = np.percentile(db, 10)
+    threshold = min(max(ENERGY_THRESHOLD_DB, noise_floor + NOISE_MARGIN_DB), MAX_THRESHOLD_DB)
+    zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+    noisy = (zcr > ZCR_NOISE) & (db < threshold + NOISE_MARGIN_DB)
+    return (db > threshold) & ~noisy
+
+def _webrtc_frames(frames, sr, aggressiveness=2):
+    global _webrtc
+    if _webrtc is None:
+        _webrtc = webrtcvad.Vad(aggressiveness)
+    pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+    return np.array([_webrtc.is_speech(f.tobytes(), sr) for f in pcm], dtype=bool)
+
+def speech_frames(samples, sr=16000, frame_ms=FRAME_MS, backend="energy"):
+    """Boolean speech mask, one entry per frame_ms frame."""
+    frames = frame_signal(samples, sr, frame_ms)
+    if len(frames) == 0:
+        return np.zeros(0, dtype=bool)
+    if backend == "webrtc" and webrtcvad is not None:
+        return _webrtc_frames(frames, sr)
+    return _energy_frames(frames)
+
+class StreamingVad:
+    """
+    Frame-at-a-time version of the energy backend for live audio: the noise
+    floor is tracked with a slow running estimate instead of a percentile.
+    """
+
+    def __init__(self, sr=16000, frame_ms=FRAME_MS, backend="energy"):
+        self.sr = sr
+        self.frame_len = int(sr * frame_ms / 1000)
+        self.backend = backend if backend != "webrtc" or webrtcvad is not None else "energy"
+        self.noise_floor = None
+
+    def is_speech(self, frame):
+        """frame: float32 samples of exactly frame_len."""
+        if self.backend == "webrtc":
+            return bool(_webrtc_frames(frame[None, :], self.sr)[0])
+        rms = float(np.sqrt(np.mean(np.square(frame, dtype=np.float32))))
+        db = 20.0 * np.log10(rms + 1e-10)
+        if self.noise_floor is None:
+            self.noise_floor = db
+        # Falls quickly to quiet frames, rises slowly so speech does not drag it up
+        rate = 0.2 if db < self.noise_floor else 0.005
+        self.noise_floor += rate * (db - self.noise_floor)
+        threshold = min(max(ENERGY_THRESHOLD_DB, self.noise_floor + NOISE_MARGIN_DB), MAX_THRESHOLD_DB)
+        zcr = float(np.mean(np.signbit(frame[1:]) != np.signbit(frame[:-1])))
+        noisy = zcr > ZCR_NOISE and db < threshold + NOISE_MARGIN_DB
+        return db > threshold and not noisy
+
+def dilate(mask, n):
+    """Extends every speech frame by n frames on both sides (hangover)."""
+    if n <= 0 or not mask.any():
+        return mask
+    return np.convolve(mask.astype(np.int8), np.ones(2 * n + 1, dtype=np.int8), mode="same") > 0
+
+def trim_silence(samples, sr=16000, backend="energy", min_speech_ms=MIN_SPEECH_MS, pad_ms=HANGOVER_MS):
+    """
+    Returns samples trimmed to the span containing speech, or None if the
+    chunk holds less than min_speech_ms of speech.
+    """
+    mask = speech_frames(samples, sr, FRAME_MS, backend)
+    if mask.sum() * FRAME_MS < min_speech_ms:
+        return None
+    mask = dilate(mask, pad_ms // FRAME_MS)
+    idx = np.flatnonzero(mask)
+    frame_len = int(sr * FRAME_MS / 1000)
+    start = idx[0] * frame_len
+    end = len(samples) if idx[-1] == len(mask) - 1 else (idx[-1] + 1) * frame_len
+    return samples[start:end]
@@ -0,0 +1,78 @@
+# utils/wire_protocol.py
+"""
+Versioned single-frame binary protocol for audio chunks.
+
+Frame layout (network byte order), followed by the session id and the audio:
+
+    magic       3s   b"XAI"
+    version     B    PROTOCOL_VERSION
+    encoding    B    ENC_PCM16 | ENC_WAV | ENC_FLAC
+    channels    B    always 1 today
+    sample_rate I
+    seq         I    per-session sequence number
+    capture_ts  d    unix time the chunk was captured
+    session_len H    length of the UTF-8 session id that follows
+
+The legacy JSON "audio_chunk" header + separate WAV frame is still accepted by
+the node; WAV frames start with b"RIFF" so the two can never be confused.
+"""
+import io, struct
+import numpy as np
+import soundfile as sf
+from utils.audio_utils import decode_audio_bytes, resample_linear, WHISPER_SR
+
+MAGIC = b"XAI"
+PROTOCOL_VERSION = 1
+ENC_PCM16 = 1   # raw little-endian int16 mono
+ENC_WAV = 2     # WAV container (what the legacy path sends)
+ENC_FLAC = 3    # lossless, roughly half the size of PCM for speech
+ENCODINGS = {"pcm16": ENC_PCM16, "wav": ENC_WAV, "flac": ENC_FLAC}
+
+HEADER = struct.Struct("!3sBBBIIdH")
+
+def is_framed(frame):
+    return len(frame) >= HEADER.size and frame[:3] == MAGIC
+
+def pack_chunk(session_id, seq, capture_ts, payload, sample_rate, encoding=ENC_PCM16):
+    sid = session_id.encode("utf-8")
+    return b"".join((HEADER.pack(MAGIC, PROTOCOL_VERSION, encoding, 1, sample_rate, seq, capture_ts, len(sid)),
+                     sid, payload))
+
+def unpack_chunk(frame):
+    """Returns (header dict, payload memoryview). Raises ValueError on a bad frame."""
+    if not is_framed(frame):
+        raise ValueError("not an XAIONET audio frame")
+    magic, version, encoding, channels, sample_rate, seq, capture_ts, sid_len = HEADER.unpack_from(frame)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"unsupported protocol version {version}")
+    end = HEADER.size + sid_len
+    if len(frame) < end:
+        raise ValueError("truncated frame")
+    header = {
+        "type": "audio_chunk",
+        "session_id": bytes(frame[HEADER.size:end]).decode("utf-8") or None,
+        "seq": seq,
+        "capture_ts": capture_ts,
+        "sample_rate": sample_rate,
+        "encoding": encoding,
+        "channels": channels
+    }
+    return header, memoryview(frame)[end:]
+
+def encode_audio(pcm, sample_rate, encoding=ENC_PCM16):
+    """int16 mono samples -> payload bytes for the given encoding."""
+    pcm = np.asarray(pcm, dtype=np.int16).reshape(-1)
+    if encoding == ENC_PCM16:
+        return pcm.astype("<i2", copy=False).tobytes()
+    buf = io.BytesIO()
+    sf.write(buf, pcm, sample_rate, format="FLAC" if encoding == ENC_FLAC else "WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+def decode_payload(payload, encoding, sample_rate=WHISPER_SR, target_sr=WHISPER_SR):
+    """Payload bytes -> float32 mono at target_sr."""
+    if encoding == ENC_PCM16:
+        samples = np.frombuffer(payload, dtype="<i2").astype(np.float32) / 32768.0
+        return resample_linear(samples, sample_rate, target_sr)
+    if encoding in (ENC_WAV, ENC_FLAC):
+        return decode_audio_bytes(bytes(payload), target_sr)
+    raise ValueError(f"unknown audio encoding {encoding}")